@@ -1,28 +1,29 @@
 import re
-from openai import OpenAI
-from typing import List, Tuple, Optional
+from typing import Iterator, List, Tuple
 from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from datetime import datetime, timedelta
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+import httplib2
+import threading
 import json
 import os
 from hooks_config import VIRAL_HOOKS
+from concurrency_limits import limit
+from llm_cache import acached_chat_completion, cached_chat_completion, get_llm_cache
+from metrics import record_token_usage, span
+from openai.types import CompletionUsage
+from openai_clients import get_async_openai_client, get_openai_client
+from rate_limiter import call_openai, estimate_tokens, get_rate_limiter
+from tweet_formatter import format_locally
 import random
 
-def split_tweets_with_gpt4(text: str) -> List[str]:
-    """Splits a string of tweets using the OpenAI GPT-4 API."""
-    try:
-        client = OpenAI()
-        
-        # Normalize the input text
-        text = text.replace('"', '"').replace('"', '"').replace("'", "'").replace('–', '-')
-        
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[
-                {
-                    "role": "system",
-                    "content": """You are an expert at natural tweet processing. Your task is to:
+TWEET_MODEL = "gpt-4"
+TWEET_TEMPERATURE = 0.3  # Lower temperature for more conservative output
+
+TWEET_SYSTEM_PROMPT = """You are an expert at natural tweet processing. Your task is to:
 
 1. Keep the original message almost exactly as is
 2. Make only minimal, natural adjustments for readability
@@ -50,26 +51,85 @@ If you're a small business owner unsure about social media marketing, what advic
 The most effective content is visual. Use images, videos, and infographics. Visuals attract attention.
 
 Want to grow faster? Learn new things, put them into action, and stay consistent."""
-                },
-                {
-                    "role": "user",
-                    "content": f"Process these tweets with minimal changes, keeping them as close to the original as possible:\n\n{text}"
-                }
-            ],
-            temperature=0.3  # Lower temperature for more conservative output
+
+def _normalize_text(text: str) -> str:
+    """Applies the quote and dash normalization used for tweet text."""
+    return text.replace('"', '"').replace('"', '"').replace("'", "'").replace('–', '-')
+
+def _tweet_messages(text: str) -> List[dict]:
+    """Builds the chat messages for the tweet-splitting prompt."""
+    return [
+        {
+            "role": "system",
+            "content": TWEET_SYSTEM_PROMPT
+        },
+        {
+            "role": "user",
+            "content": f"Process these tweets with minimal changes, keeping them as close to the original as possible:\n\n{_normalize_text(text)}"
+        }
+    ]
+
+def _split_completion(content: str) -> List[str]:
+    """Splits a completion into cleaned tweets at double newlines."""
+    tweets = []
+    for tweet in content.strip().split("\n\n"):
+        if tweet.strip():
+            tweets.append(_normalize_text(tweet.strip()))
+    return tweets
+
+def split_tweets_with_gpt4(text: str, bypass_cache: bool = False, local_fast_path: bool = True) -> List[str]:
+    """Splits a string of tweets using the OpenAI GPT-4 API.
+
+    Text that tweet_formatter can format on its own skips the API entirely
+    (unless local_fast_path is False). Identical requests are answered from
+    the LLM cache unless bypass_cache is set.
+    """
+    if local_fast_path:
+        tweets = format_locally(text)
+        if tweets:
+            return tweets
+
+    try:
+        client = get_openai_client()
+        
+        content = cached_chat_completion(
+            client,
+            model=TWEET_MODEL,
+            messages=_tweet_messages(text),
+            temperature=TWEET_TEMPERATURE,
+            bypass_cache=bypass_cache
         )
         
         # Process response
-        if response.choices:
-            content = response.choices[0].message.content.strip()
-            tweets = []
-            for tweet in content.split("\n\n"):
-                if tweet.strip():
-                    cleaned_tweet = tweet.strip()
-                    cleaned_tweet = cleaned_tweet.replace('"', '"').replace('"', '"')
-                    cleaned_tweet = cleaned_tweet.replace("'", "'").replace('–', '-')
-                    tweets.append(cleaned_tweet)
+        if content:
+            return _split_completion(content)
+        else:
+            print("No choices returned from OpenAI API.")
+            return []
+
+    except Exception as e:
+        print(f"Error during OpenAI API call: {str(e)}")
+        raise Exception(f"OpenAI API error: {str(e)}")
+
+async def asplit_tweets_with_gpt4(text: str, bypass_cache: bool = False, local_fast_path: bool = True) -> List[str]:
+    """Async variant of split_tweets_with_gpt4; run it on the background event loop."""
+    if local_fast_path:
+        tweets = format_locally(text)
+        if tweets:
             return tweets
+
+    try:
+        content = await acached_chat_completion(
+            get_async_openai_client(),
+            model=TWEET_MODEL,
+            messages=_tweet_messages(text),
+            temperature=TWEET_TEMPERATURE,
+            bypass_cache=bypass_cache
+        )
+        
+        # Process response
+        if content:
+            return _split_completion(content)
         else:
             print("No choices returned from OpenAI API.")
             return []
@@ -78,6 +138,96 @@ Want to grow faster? Learn new things, put them into action, and stay consistent
         print(f"Error during OpenAI API call: {str(e)}")
         raise Exception(f"OpenAI API error: {str(e)}")
 
+def stream_tweets_with_gpt4(text: str, bypass_cache: bool = False, local_fast_path: bool = True) -> Iterator[str]:
+    """Like split_tweets_with_gpt4, but yields each tweet as soon as it is complete.
+
+    The completion is requested with stream=True and a tweet is emitted every
+    time a double newline arrives. The full completion is cached afterwards.
+    """
+    if local_fast_path:
+        tweets = format_locally(text)
+        if tweets:
+            yield from tweets
+            return
+
+    messages = _tweet_messages(text)
+    cache = get_llm_cache()
+    key = cache.make_key(TWEET_MODEL, messages, TWEET_TEMPERATURE, None)
+
+    cached = None if bypass_cache else cache.get(key)
+    if cached is not None:
+        yield from _split_completion(cached)
+        return
+
+    try:
+        # Admission and retries cover opening the stream; the slot is held while it is read
+        estimated_tokens = estimate_tokens(messages)
+        stream = call_openai(
+            TWEET_MODEL,
+            estimated_tokens,
+            get_openai_client().chat.completions.create,
+            messages=messages,
+            temperature=TWEET_TEMPERATURE,
+            stream=True,
+            # The final chunk then carries the usage, with no choices. Sent as a raw
+            # body field because the pinned SDK predates the stream_options argument.
+            extra_body={"stream_options": {"include_usage": True}}
+        )
+        with limit('openai'), span('llm_stream', model=TWEET_MODEL):
+            received = []
+            buffer = ""
+            usage = None
+            for chunk in stream:
+                if getattr(chunk, 'usage', None) is not None:
+                    usage = chunk.usage
+                    if isinstance(usage, dict):
+                        # Fields the SDK's chunk model doesn't declare come through unparsed
+                        usage = CompletionUsage(**usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                received.append(delta)
+                buffer += delta
+                # Everything before the last double newline is a finished tweet
+                while "\n\n" in buffer:
+                    tweet, buffer = buffer.split("\n\n", 1)
+                    if tweet.strip():
+                        yield _normalize_text(tweet.strip())
+
+        if usage is not None:
+            get_rate_limiter().settle(TWEET_MODEL, estimated_tokens, usage.total_tokens)
+            record_token_usage(TWEET_MODEL, usage)
+
+        if buffer.strip():
+            yield _normalize_text(buffer.strip())
+
+        if received:
+            cache.set(key, "".join(received))
+
+    except Exception as e:
+        print(f"Error during OpenAI API call: {str(e)}")
+        raise Exception(f"OpenAI API error: {str(e)}")
+
+# Parsed Sheets discovery document, shared by every manager in the process
+_discovery_document = None
+_discovery_lock = threading.Lock()
+
+# Long-lived managers keyed by (credentials path, spreadsheet id)
+_managers = {}
+_managers_lock = threading.Lock()
+
+SHEETS_HTTP_TIMEOUT = 30
+
+def _get_discovery_document() -> str:
+    """Returns the bundled Sheets v4 discovery document, loading it only once."""
+    global _discovery_document
+    with _discovery_lock:
+        if _discovery_document is None:
+            _discovery_document = get_static_doc('sheets', 'v4')
+        return _discovery_document
+
 class GoogleSheetsManager:
     def __init__(self, credentials_path: str, spreadsheet_id: str):
         """Initialize Google Sheets connection."""
@@ -86,9 +236,28 @@ class GoogleSheetsManager:
             credentials_path,
             scopes=['https://www.googleapis.com/auth/spreadsheets']
         )
-        self.service = build('sheets', 'v4', credentials=self.credentials)
+        # httplib2 connections are not thread-safe, so each thread gets its own
+        # keep-alive connection while the credentials (and token) are shared.
+        self._local = threading.local()
+        self.service = build_from_document(
+            _get_discovery_document(),
+            http=self._thread_http(),
+            requestBuilder=self._build_request
+        )
         self.sheet = self.service.spreadsheets()
 
+    def _thread_http(self) -> AuthorizedHttp:
+        """Returns this thread's authorized HTTP connection, creating it on first use."""
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=SHEETS_HTTP_TIMEOUT))
+            self._local.http = http
+        return http
+
+    def _build_request(self, http, *args, **kwargs) -> HttpRequest:
+        """Builds API requests against the calling thread's connection."""
+        return HttpRequest(self._thread_http(), *args, **kwargs)
+
     def create_header(self):
         """Creates the header row if the sheet is empty."""
         header = [
@@ -107,110 +276,71 @@ class GoogleSheetsManager:
             body={'values': header}
         ).execute()
 
-    def get_last_entry_info(self) -> Tuple[Optional[str], Optional[str], int, int]:
-        """Gets the last date, day, and row number from the existing sheet."""
-        try:
-            result = self.sheet.values().get(
-                spreadsheetId=self.spreadsheet_id,
-                range='Sheet1!A:Z'
-            ).execute()
-            
-            values = result.get('values', [])
-            if len(values) <= 1:  # Only header or empty
-                return None, None, 2, 0
-            
-            last_row = values[-1]
-            last_date = last_row[0]
-            last_day = last_row[1]
-            
-            # Check for first empty content column
-            first_empty_column = -1
-            for i in range(5):
-                content_index = 3 + (i * 5)
-                if content_index >= len(last_row) or not last_row[content_index]:
-                    first_empty_column = i
-                    break
-            
-            if first_empty_column == -1:
-                return last_date, last_day, len(values) + 1, 0
-            else:
-                return last_date, last_day, len(values), first_empty_column
-                
-        except Exception as e:
-            print(f"Error reading sheet: {e}")
-            return None, None, 2, 0
-
-    def update_sheet(self, row_number: int, values: List[str]):
-        """Updates a row in the sheet."""
-        range_name = f'Sheet1!A{row_number}'
-        body = {
-            'values': [values]
-        }
-        self.sheet.values().update(
-            spreadsheetId=self.spreadsheet_id,
-            range=range_name,
-            valueInputOption='USER_ENTERED',
-            body=body
-        ).execute()
+    def batch_update_rows(
+        self,
+        rows: List[Tuple[int, List[str]]],
+        max_rows_per_request: int = 500,
+        max_payload_bytes: int = 2_000_000
+    ) -> List[dict]:
+        """Writes several rows with values().batchUpdate and returns a result per row.
 
-def get_current_date_and_day():
-    """Get current date formatted as DD/MM/YYYY and day name."""
-    current = datetime.now()
-    return current.strftime("%d/%m/%Y"), current.strftime("%A")
-
-def add_tweets_to_sheet(
-    sheets_manager: GoogleSheetsManager,
-    tweets: List[str],
-    start_date: Optional[str] = None,
-    start_day: Optional[str] = None
-):
-    """Adds tweets to the Google Sheet sequentially starting from current date."""
-    last_date, last_day, current_row, start_column = sheets_manager.get_last_entry_info()
-    
-    # If no last entry and no start date provided, use current date
-    if not last_date and not start_date:
-        start_date, start_day = get_current_date_and_day()
-    
-    date = last_date if last_date else start_date
-    day = last_day if last_day else start_day
-    
-    print(f"Starting from date: {date}, day: {day}, column: {start_column + 1}")
-    
-    tweet_index = 0
-    column_index = start_column
-
-    while tweet_index < len(tweets):
-        # Initialize row data
-        row = [date, day]
-        content_data = [""] * 25  # 5 blocks of 5 columns each
-
-        # Fill remaining columns in the current row
-        while column_index < 5 and tweet_index < len(tweets):
-            cleaned_tweet = tweets[tweet_index]
-            base_pos = column_index * 5
-            
-            # Set Type
-            content_data[base_pos] = "Text"
-            # Set Content
-            content_data[base_pos + 1] = cleaned_tweet
-            # Set Character count formula
-            column_letter = chr(68 + (column_index * 5))
-            content_data[base_pos + 2] = f"=LEN({column_letter}{current_row})"
-            
-            tweet_index += 1
-            column_index += 1
-        
-        # Update the sheet
-        sheets_manager.update_sheet(current_row, row + content_data)
-        
-        # Move to next row if needed
-        if tweet_index < len(tweets):
-            current_row += 1
-            column_index = 0
-            # Calculate next date and day
-            next_date = datetime.strptime(date, "%d/%m/%Y") + timedelta(days=1)
-            date = next_date.strftime("%d/%m/%Y")
-            day = next_date.strftime("%A")
+        Rows are grouped into chunks bounded by row count and serialized payload
+        size. A chunk the API rejects as too large is split in half and retried.
+        """
+        results = {row_number: {'row': row_number, 'updated': False, 'error': None}
+                   for row_number, _ in rows}
+
+        chunks = []
+        current, current_size = [], 0
+        for row_number, values in rows:
+            entry = {'range': f'Sheet1!A{row_number}', 'values': [values]}
+            entry_size = len(json.dumps(entry))
+            if current and (len(current) >= max_rows_per_request or
+                            current_size + entry_size > max_payload_bytes):
+                chunks.append(current)
+                current, current_size = [], 0
+            current.append((row_number, entry))
+            current_size += entry_size
+        if current:
+            chunks.append(current)
+
+        while chunks:
+            chunk = chunks.pop(0)
+            try:
+                self.sheet.values().batchUpdate(
+                    spreadsheetId=self.spreadsheet_id,
+                    body={
+                        'valueInputOption': 'USER_ENTERED',
+                        'data': [entry for _, entry in chunk]
+                    }
+                ).execute()
+                for row_number, _ in chunk:
+                    results[row_number]['updated'] = True
+            except HttpError as e:
+                if e.resp.status == 413 and len(chunk) > 1:
+                    # Payload too large: retry as two smaller batches
+                    middle = len(chunk) // 2
+                    chunks[:0] = [chunk[:middle], chunk[middle:]]
+                    continue
+                print(f"Error writing rows to sheet: {e}")
+                for row_number, _ in chunk:
+                    results[row_number]['error'] = str(e)
+
+        return [results[row_number] for row_number, _ in rows]
+
+def get_sheets_manager(credentials_path: str, spreadsheet_id: str) -> GoogleSheetsManager:
+    """Returns the process-wide manager for a credentials file and spreadsheet.
+
+    Managers are created once and reused, so the service account file, the
+    discovery document and the access token are not reloaded per request.
+    """
+    key = (str(credentials_path), spreadsheet_id)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = GoogleSheetsManager(str(credentials_path), spreadsheet_id)
+            _managers[key] = manager
+        return manager
 
 if __name__ == "__main__":
     CREDENTIALS_FILE = os.getenv('GOOGLE_SHEETS_CREDENTIALS_FILE')
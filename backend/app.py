@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
 from pathlib import Path
@@ -6,66 +6,101 @@ import traceback
 import json
 import sys  
 import logging
-from hooks_config import VIRAL_HOOKS
+from datetime import date, timedelta
+from hooks_catalog import get_hooks_catalog
 from werkzeug.urls import quote as url_quote
 
 sys.path.append(str(Path(__file__).parent))
 
-from GPT4_make_scheduler import split_tweets_with_gpt4, GoogleSheetsManager, add_tweets_to_sheet
-from vision_processor import VisionProcessor
-from article_processor import ArticleProcessor
-from social_media_processor import SocialMediaProcessor
+from GPT4_make_scheduler import split_tweets_with_gpt4, stream_tweets_with_gpt4
+from vision_processor import get_vision_processor
+from article_processor import get_article_processor
+from social_media_processor import get_social_media_processor
+from instagram_sessions import get_instagram_pool
+from jobs import QueueFull, get_job_queue
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render as render_metrics
+from rate_limiter import get_rate_limiter
+from schedule_journal import get_schedule_journal
+from schedule_store import get_schedule_store, get_sheets_mirror
+from slot_planner import CapacityPolicy
+from batch_processor import BATCH_MAX_URLS, process_batch
+from settings import UPLOAD_FOLDER, configure_logging, credentials_path
 
 app = Flask(__name__)
 CORS(app)
 
-UPLOAD_FOLDER = Path(__file__).parent / 'uploads'
-UPLOAD_FOLDER.mkdir(exist_ok=True)
-
-# Load configuration
-config_path = Path(__file__).parent.parent / 'config.json'
-with open(config_path) as config_file:
-    config = json.load(config_file)
+configure_logging()
+logger = logging.getLogger(__name__)
 
-# Make credentials path relative to the project root
-credentials_path = Path(__file__).parent.parent / config['google_sheets_credentials_file']
+# Resume flushing anything a previous run left in the schedule journal
+get_schedule_journal()
 
-logging.basicConfig(level=logging.DEBUG)
-logger = logging.getLogger(__name__)
+def _plan_schedule(tweets, policy):
+    """Dry-run slot plan for /api/schedule (imports the sheet first if the store is new)."""
+    get_sheets_mirror().bootstrap()
+    return get_schedule_store().add_tweets(tweets, policy=policy, dry_run=True)
 
 @app.route('/api/schedule', methods=['POST'])
 def schedule_tweets():
-    """Schedule processed tweets to Google Sheets."""
+    """Queue processed tweets for Google Sheets; the journal flusher writes them."""
     try:
         data = request.json
-        tweets = data.get('tweets', '').split('\n\n')
+        tweets = [tweet for tweet in data.get('tweets', '').split('\n\n') if tweet.strip()]
         
         if not tweets:
             return jsonify({'error': 'No tweets provided'}), 400
 
-        logger.debug("Saving to Google Sheets...")
-        # Use stored credentials
-        openai_key = config.get('openai_api_key')
-        sheets_id = config.get('google_sheets_id')
-        
         if not credentials_path.exists():
-            return jsonify({'error': f'Google credentials file not found at {credentials_path}'}, 400)
+            return jsonify({'error': f'Google credentials file not found at {credentials_path}'}), 400
 
-        # Initialize Google Sheets manager
-        sheets_manager = GoogleSheetsManager(str(credentials_path), sheets_id)
-        
-        # Create header if needed
-        sheets_manager.create_header()
-        
-        # Add tweets to sheet
-        add_tweets_to_sheet(sheets_manager, tweets)
+        try:
+            policy = CapacityPolicy.from_dict(data.get('policy'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid policy: {e}'}), 400
 
-        return jsonify({'message': 'Tweets scheduled successfully'})
+        if data.get('dryRun'):
+            # Plan against the current schedule without writing anything
+            return jsonify({
+                'plan': _plan_schedule(tweets, policy).to_dict(),
+                'policy': policy.to_dict(),
+                'queuedAhead': get_schedule_journal().status()['pending']
+            })
+
+        batch_id = get_schedule_journal().append(tweets, policy)
+        logger.info(f"Queued {len(tweets)} tweets for Google Sheets (batch {batch_id})")
+
+        return jsonify({
+            'message': 'Tweets queued for scheduling',
+            'batchId': batch_id,
+            'queued': len(tweets),
+            'statusUrl': f'/api/schedule/status?batch={batch_id}'
+        }), 202
 
     except Exception as e:
         logger.error(f"Error details: {traceback.format_exc()}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/schedule/status', methods=['GET'])
+def schedule_status():
+    """Report pending, flushed and failed journal entries (optionally for one batch)."""
+    return jsonify(get_schedule_journal().status(request.args.get('batch')))
+
+@app.route('/api/schedule/slots', methods=['GET'])
+def schedule_slots():
+    """List scheduled slots between two ISO dates (default: the next 30 days) from the local store."""
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else date.today()
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else start + timedelta(days=30)
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD dates'}), 400
+
+    store = get_schedule_store()
+    next_date, next_slot = store.next_free_slot()
+    return jsonify({
+        'slots': store.between(start, end),
+        'nextFreeSlot': {'date': next_date.isoformat(), 'slot': next_slot}
+    })
+
 @app.route('/api/process-article', methods=['POST'])
 def process_article():
     """Process article URL and return tweet content."""
@@ -76,8 +111,8 @@ def process_article():
         if not url:
             return jsonify({'error': 'No URL provided'}), 400
 
-        processor = ArticleProcessor()
-        content = processor.process_url_sync(url)
+        processor = get_article_processor()
+        content = processor.process_url_sync(url, bypass_cache=bool(data.get('bypassCache')))
         
         if not content:
             return jsonify({'error': 'Failed to process article'}), 400
@@ -91,16 +126,40 @@ def process_article():
         logger.error(f"Error processing article: {traceback.format_exc()}")
         return jsonify({'error': str(e)}), 500
 
+def _payload_response(payload):
+    """Serve a precompiled hooks payload, honouring If-None-Match and Accept-Encoding."""
+    status, body, headers = payload.respond(
+        request.headers.get('If-None-Match', ''), request.headers.get('Accept-Encoding', '')
+    )
+    return Response(body, status=status, headers=headers)
+
 @app.route('/api/hooks', methods=['GET'])
 def get_hooks():
     """API endpoint to get viral hooks."""
-    return jsonify(VIRAL_HOOKS)
+    return _payload_response(get_hooks_catalog().all)
+
+@app.route('/api/hooks/search', methods=['GET'])
+def search_hooks():
+    """Search hook templates by word or {placeholder}, one page at a time."""
+    try:
+        page = int(request.args.get('page', 1))
+        page_size = int(request.args.get('pageSize', 20))
+    except ValueError:
+        return jsonify({'error': 'page and pageSize must be integers'}), 400
+
+    category = request.args.get('category') or None
+    catalog = get_hooks_catalog()
+    if category and category not in catalog.categories:
+        return jsonify({"error": "Category not found"}), 404
+
+    return jsonify(catalog.search(request.args.get('q', ''), category, page, page_size))
 
 @app.route('/api/hooks/<category>', methods=['GET'])
 def get_category_hooks(category):
     """API endpoint to get hooks by category."""
-    if category in VIRAL_HOOKS:
-        return jsonify(VIRAL_HOOKS[category])
+    payload = get_hooks_catalog().categories.get(category)
+    if payload is not None:
+        return _payload_response(payload)
     return jsonify({"error": "Category not found"}), 404
 
 @app.route('/api/process-tweets', methods=['POST'])
@@ -113,7 +172,7 @@ def process_tweets():
         
         # Process images if they exist
         if 'images' in request.files:
-            vision_processor = VisionProcessor()
+            vision_processor = get_vision_processor()
             image_instructions = request.form.get('imageInstructions', '')
             
             logger.debug("Processing images...")
@@ -134,7 +193,12 @@ def process_tweets():
         if raw_text_content:
             logger.debug("Generating tweet variations...")
             combined_text = "\n\n".join(raw_text_content)
-            all_tweets = split_tweets_with_gpt4(combined_text)
+            bypass_cache = request.form.get('bypassCache', '').lower() == 'true'
+            # forceRewrite always sends the text to GPT-4, even if it is already tweet-ready
+            local_fast_path = request.form.get('forceRewrite', '').lower() != 'true'
+            all_tweets = split_tweets_with_gpt4(
+                combined_text, bypass_cache=bypass_cache, local_fast_path=local_fast_path
+            )
         
         if not all_tweets:
             return jsonify({'error': 'No tweets were generated from either images or text'}), 400
@@ -147,9 +211,71 @@ def process_tweets():
         logger.error(f"Error details: {traceback.format_exc()}")
         return jsonify({'error': str(e)}), 500
 
+def _process_social_media_job(url, bypass_cache, progress):
+    """Background job body for /api/process-social-media."""
+    content = get_social_media_processor().process_url_sync(
+        url, bypass_cache=bypass_cache, progress=progress
+    )
+    if not content:
+        return None
+
+    return {
+        'tweet': content,  # Now contains just the tweet without URL
+        'originalContent': content,
+        'sourceUrl': url  # Separate field for URL if needed
+    }
+
+@app.route('/api/process-tweets/stream', methods=['POST'])
+def process_tweets_stream():
+    """Process tweets like /api/process-tweets, streaming each tweet as a server-sent event."""
+    raw_text_content = []
+
+    # Process images if they exist
+    if 'images' in request.files:
+        image_files = request.files.getlist('images')
+        if image_files:
+            extracted_text = get_vision_processor().process_images(
+                image_files, request.form.get('imageInstructions', '')
+            )
+            if extracted_text:
+                raw_text_content.extend(extracted_text)
+
+    # Process text tweets if they exist
+    text_tweets = request.form.get('tweets')
+    if text_tweets:
+        raw_text_content.append(text_tweets)
+
+    if not raw_text_content:
+        return jsonify({'error': 'No tweets were generated from either images or text'}), 400
+
+    combined_text = "\n\n".join(raw_text_content)
+    bypass_cache = request.form.get('bypassCache', '').lower() == 'true'
+    local_fast_path = request.form.get('forceRewrite', '').lower() != 'true'
+
+    def generate():
+        tweets = []
+        try:
+            for tweet in stream_tweets_with_gpt4(
+                combined_text, bypass_cache=bypass_cache, local_fast_path=local_fast_path
+            ):
+                yield f"event: tweet\ndata: {json.dumps({'index': len(tweets), 'tweet': tweet})}\n\n"
+                tweets.append(tweet)
+        except Exception as e:
+            logger.error(f"Error streaming tweets: {traceback.format_exc()}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+            return
+        processed_tweets = "\n\n".join(tweets)
+        yield f"event: done\ndata: {json.dumps({'processedTweets': processed_tweets})}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @app.route('/api/process-social-media', methods=['POST'])
 def process_social_media():
-    """Process social media URL and return tweet content."""
+    """Queue a social media URL for processing and return the job id."""
     try:
         data = request.json
         url = data.get('url')
@@ -157,21 +283,106 @@ def process_social_media():
         if not url:
             return jsonify({'error': 'No URL provided'}), 400
 
-        processor = SocialMediaProcessor()
-        content = processor.process_url_sync(url)
-        
-        if not content:
-            return jsonify({'error': 'Failed to process social media content'}), 400
+        job = get_job_queue().submit(
+            'social-media', _process_social_media_job, url, bool(data.get('bypassCache'))
+        )
 
         return jsonify({
-            'tweet': content,  # Now contains just the tweet without URL
-            'originalContent': content,
-            'sourceUrl': url  # Separate field for URL if needed
-        })
+            'jobId': job.id,
+            'status': job.status,
+            'statusUrl': f'/api/jobs/{job.id}',
+            'eventsUrl': f'/api/jobs/{job.id}/events'
+        }), 202
 
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 503
     except Exception as e:
         logger.error(f"Error processing social media: {traceback.format_exc()}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/process-batch', methods=['POST'])
+def process_batch_urls():
+    """Process a list of URLs concurrently, streaming each result as server-sent events."""
+    data = request.json or {}
+    urls = [url.strip() for url in data.get('urls', []) if isinstance(url, str) and url.strip()]
+
+    if not urls:
+        return jsonify({'error': 'No URLs provided'}), 400
+    if len(urls) > BATCH_MAX_URLS:
+        return jsonify({'error': f'At most {BATCH_MAX_URLS} URLs per batch'}), 400
+
+    bypass_cache = bool(data.get('bypassCache'))
+
+    def generate():
+        succeeded = failed = 0
+        for result in process_batch(urls, bypass_cache=bypass_cache):
+            if 'error' in result:
+                failed += 1
+            else:
+                succeeded += 1
+            yield f"event: result\ndata: {json.dumps(result)}\n\n"
+        summary = {'total': len(urls), 'succeeded': succeeded, 'failed': failed}
+        yield f"event: done\ndata: {json.dumps(summary)}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Return the status, stage and (when finished) the result of a job."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    """Cancel a queued or running job."""
+    job = get_job_queue().cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    """Stream a job's progress as server-sent events."""
+    queue = get_job_queue()
+    if queue.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    def generate():
+        for event in queue.events(job_id):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: stage\ndata: {json.dumps(event)}\n\n"
+        job = queue.get(job_id)
+        if job is not None:
+            yield f"event: done\ndata: {json.dumps(job.to_dict())}\n\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/rate-limits', methods=['GET'])
+def get_rate_limits():
+    """Report OpenAI admission queue depth, per-model bucket state and Instagram session budgets."""
+    limiter = get_rate_limiter()
+    return jsonify({
+        'queueDepth': limiter.queue_depth(),
+        'models': limiter.stats(),
+        'instagram': get_instagram_pool().stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Stage timings, token usage and cache hit rates in the Prometheus text format."""
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
 if __name__ == '__main__':
     app.run(port=3000, debug=True)
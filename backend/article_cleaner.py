@@ -0,0 +1,93 @@
+"""Single-pass cleaning of crawled article markdown, trimmed to a token budget."""
+import os
+import re
+from typing import List
+
+from token_counter import count_tokens
+
+ARTICLE_TOKEN_BUDGET = int(os.getenv('ARTICLE_TOKEN_BUDGET', '600'))
+MIN_PARAGRAPH_WORDS = 8
+
+# One alternation handles every inline rewrite, so the text is scanned once
+INLINE_PATTERN = re.compile(
+    r'(?P<image>!\[[^\]]*\]\([^)]*\))'           # images are dropped
+    r'|\[(?P<link_text>[^\]]*)\]\([^)]*\)'        # links keep their text
+    r'|(?P<url>https?://\S+)'                     # bare URLs are dropped
+    r'|(?P<markup>[#*`_~\[\]{}()]+)'              # leftover markdown syntax
+    r'|(?P<space>[ \t\r\f\v]+)'                   # runs of spaces (not newlines)
+)
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+BOILERPLATE_PATTERN = re.compile(
+    r'cookie policy|privacy policy|terms of service|subscribe to our newsletter|advertisement'
+    r'|sign up for|all rights reserved|share this article|related articles|read more|follow us',
+    re.IGNORECASE
+)
+NUMBER_PATTERN = re.compile(r'\d')
+# Dropped images and URLs leave the spaces on both sides of them behind
+SPACE_RUN_PATTERN = re.compile(r' {2,}')
+
+def _rewrite(match: re.Match) -> str:
+    if match.group('link_text') is not None:
+        return match.group('link_text')
+    if match.group('space') is not None:
+        return ' '
+    return ''
+
+def _strip_markup(content: str) -> List[str]:
+    """Strips markup in one pass and returns every non-empty paragraph."""
+    cleaned = SPACE_RUN_PATTERN.sub(' ', INLINE_PATTERN.sub(_rewrite, content))
+    paragraphs = []
+    for block in PARAGRAPH_BREAK.split(cleaned):
+        paragraph = ' '.join(line.strip() for line in block.splitlines() if line.strip())
+        if paragraph:
+            paragraphs.append(paragraph)
+    return paragraphs
+
+def split_paragraphs(content: str) -> List[str]:
+    """Strips markup in one pass and returns the non-boilerplate paragraphs."""
+    paragraphs = []
+    for paragraph in _strip_markup(content):
+        words = len(paragraph.split())
+        # Navigation crumbs, captions and footer links are short; boilerplate says so outright
+        if words < MIN_PARAGRAPH_WORDS or (BOILERPLATE_PATTERN.search(paragraph) and words < 40):
+            continue
+        paragraphs.append(paragraph)
+    return paragraphs
+
+def _score(paragraph: str, position: int) -> float:
+    """Higher for longer, fact-dense, lexically varied paragraphs near the top."""
+    words = paragraph.split()
+    unique_ratio = len({word.lower() for word in words}) / len(words)
+    has_numbers = 1.0 if NUMBER_PATTERN.search(paragraph) else 0.0
+    length_score = min(len(words), 80) / 80
+    position_score = 1.0 / (1 + position * 0.25)
+    return length_score + unique_ratio + 0.5 * has_numbers + position_score
+
+def clean_article(content: str, token_budget: int = ARTICLE_TOKEN_BUDGET) -> str:
+    """Cleans article markdown and keeps the most informative paragraphs within token_budget.
+
+    Selected paragraphs are returned in their original order, separated by blank lines.
+    Pages made only of short paragraphs (short posts, lists) fall back to all
+    of their text, cut to the budget.
+    """
+    paragraphs = split_paragraphs(content)
+    if not paragraphs:
+        words = ' '.join(_strip_markup(content)).split()
+        return ' '.join(words[:max(1, token_budget * 3 // 4)])
+    ranked = sorted(range(len(paragraphs)), key=lambda i: _score(paragraphs[i], i), reverse=True)
+
+    chosen = []
+    used = 0
+    for index in ranked:
+        tokens = count_tokens(paragraphs[index])
+        if used + tokens > token_budget:
+            continue
+        chosen.append(index)
+        used += tokens
+
+    if not chosen and paragraphs:
+        # Even the best paragraph is over budget: cut it down by words
+        words = paragraphs[ranked[0]].split()
+        return ' '.join(words[:max(1, token_budget * 3 // 4)])
+
+    return '\n\n'.join(paragraphs[index] for index in sorted(chosen))
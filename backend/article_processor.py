@@ -1,51 +1,61 @@
-import asyncio
-from crawl4ai import AsyncWebCrawler
+from concurrency_limits import async_platform_limit
+from crawler_pool import get_crawler_pool
 from typing import Optional
-import nest_asyncio
 import re
-from openai import OpenAI
+from article_cleaner import clean_article
 import os
+import threading
 import random
 from hooks_config import VIRAL_HOOKS
+from hook_index import LOW_CONFIDENCE_MARGIN, get_hook_index
+from event_loop import get_background_loop
+from metrics import platform_context, span
+from llm_cache import acached_chat_completion, cached_chat_completion
+from openai_clients import get_async_openai_client, get_openai_client
 import logging
 
-# Enable nested event loops
-nest_asyncio.apply()
-
 logger = logging.getLogger(__name__)
 
 class ArticleProcessor:
-    def __init__(self):
-        self.client = OpenAI()  # Will use OPENAI_API_KEY from environment
+    def __init__(self, client=None, async_client=None):
+        self.client = client or get_openai_client()  # Will use OPENAI_API_KEY from environment
+        self.async_client = async_client or get_async_openai_client()
 
-    async def process_url(self, url: str) -> Optional[str]:
+    async def process_url(self, url: str, bypass_cache: bool = False) -> Optional[str]:
         """Process an article URL and return a tweet-worthy summary."""
+        with platform_context('article'):
+            return await self._process_url(url, bypass_cache=bypass_cache)
+
+    async def _process_url(self, url: str, bypass_cache: bool) -> Optional[str]:
         try:
-            # Configure crawler with more robust settings
-            async with AsyncWebCrawler() as crawler:
-                result = await crawler.arun(
-                    url=url,
-                    max_pages=1,
-                    markdown=True,
-                    timeout=30,
-                    extract_content=True,
-                    headers={
-                        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-                    },
-                    follow_redirects=True,
-                    verify_ssl=False  # Be careful with this in production
-                )
+            # Crawl with a warm browser from the shared pool
+            crawler_pool = get_crawler_pool()
+            async with async_platform_limit('article'):
+                with span('crawl'):
+                    result = await crawler_pool.crawl(
+                        url,
+                        max_pages=1,
+                        markdown=True,
+                        timeout=30,
+                        extract_content=True,
+                        headers={
+                            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+                        },
+                        follow_redirects=True,
+                        verify_ssl=False  # Be careful with this in production
+                    )
 
             if not result or not result.markdown:
                 # Try alternative extraction if primary fails
-                async with AsyncWebCrawler() as crawler:
-                    result = await crawler.arun(
-                        url=url,
-                        max_pages=1,
-                        extract_text=True,  # Fallback to text extraction
-                        timeout=30
-                    )
-                    
+                async with async_platform_limit('article'):
+                    with span('crawl'):
+                        result = await crawler_pool.crawl(
+                            url,
+                            max_pages=1,
+                            extract_text=True,  # Fallback to text extraction
+                            timeout=30
+                        )
+                
                 if not result or (not result.text and not result.markdown):
                     raise Exception("No content extracted from URL")
                 
@@ -55,95 +65,76 @@ class ArticleProcessor:
                 content = result.markdown
 
             # Clean up the content
-            content = self._clean_content(content)
+            with span('clean'):
+                content = self._clean_content(content)
+            if not content.strip():
+                raise Exception("No content extracted from URL")
             
-            return self._create_tweet(content, url)
+            return await self._create_tweet(content, url, bypass_cache=bypass_cache)
 
         except Exception as e:
             logger.error(f"Error processing article: {str(e)}")
             return None
 
     def _clean_content(self, content: str) -> str:
-        """Clean and format the extracted content."""
-        # Remove URLs
-        content = re.sub(r'http\S+', '', content)
-        # Remove markdown formatting
-        content = re.sub(r'[#*`_~\[\]\(\)\{\}]', '', content)
-        # Fix multiple newlines
-        content = re.sub(r'\n\s*\n', '\n\n', content)
-        # Fix multiple spaces
-        content = re.sub(r'\s+', ' ', content)
-        # Remove common boilerplate text
-        content = re.sub(r'(Cookie Policy|Privacy Policy|Terms of Service|Subscribe to our newsletter|Advertisement)', '', content, flags=re.IGNORECASE)
-        # Get first few paragraphs
-        paragraphs = content.split('\n\n')
-        main_content = '\n\n'.join(paragraphs[:3])
-        return main_content.strip()
-
-    def process_url_sync(self, url: str) -> Optional[str]:
-        """Synchronous wrapper for process_url."""
-        return asyncio.run(self.process_url(url))
-
-    def get_viral_hook(self, content: str) -> str:
-        """Select appropriate viral hook based on content."""
+        """Clean the extracted content and keep its most informative paragraphs.
+
+        See article_cleaner.clean_article; the result fits ARTICLE_TOKEN_BUDGET.
+        """
+        return clean_article(content)
+
+    def process_url_sync(self, url: str, bypass_cache: bool = False) -> Optional[str]:
+        """Synchronous wrapper for process_url; runs it on the shared background loop."""
+        return get_background_loop().run(self.process_url(url, bypass_cache=bypass_cache))
+
+    def get_viral_hook(self, content: str, bypass_cache: bool = False, llm_rerank: bool = True) -> str:
+        """Select appropriate viral hook based on content.
+
+        Category and template come from the local TF-IDF hook index; GPT-4 is
+        only asked to rerank when the index cannot separate the top categories.
+        """
         try:
-            # Analyze content to select best hook type
-            response = self.client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": """Analyze the article content and select the most appropriate viral hook type:
-1. Question Hook (for how-to/educational content)
-2. Challenge Hook (for myth-busting/contrarian views)
-3. Story Hook (for case studies/experiences)
-4. Authority Hook (for expert insights/research)
-5. Stats Hook (for data-driven content)
-Choose the most engaging format based on content."""
-                    },
-                    {
-                        "role": "user",
-                        "content": content
-                    }
-                ],
-                max_tokens=50
-            )
-            
-            hook_type = response.choices[0].message.content.strip().lower()
-            # Get appropriate hook based on content analysis
-            hooks = VIRAL_HOOKS.get(hook_type, VIRAL_HOOKS["question"])["examples"]
-            
-            # Use GPT to select most relevant hook template
-            response = self.client.chat.completions.create(
+            hook_index = get_hook_index()
+            category, hook, confidence = hook_index.select(content)
+            if not llm_rerank or confidence >= LOW_CONFIDENCE_MARGIN:
+                return hook
+
+            # Low confidence: let GPT choose among the two closest categories
+            ranked = hook_index.rank_categories(content)
+            hooks = [template for name, _ in ranked[:2] for template in VIRAL_HOOKS[name]["examples"]]
+            selected_hook = cached_chat_completion(
+                self.client,
                 model="gpt-4",
                 messages=[
                     {
                         "role": "system", 
-                        "content": "Select the most appropriate hook template that matches the article's content and message. Consider the key points, tone, and purpose of the article."
+                        "content": "Select the most appropriate hook template that matches the article's content and message. Consider the key points, tone, and purpose of the article. Reply with the template exactly as written."
                     },
                     {
                         "role": "user",
                         "content": f"Article content: {content}\n\nAvailable hook templates:\n" + "\n".join(hooks)
                     }
                 ],
-                max_tokens=50
+                max_tokens=50,
+                bypass_cache=bypass_cache
             )
             
-            selected_hook = response.choices[0].message.content.strip()
+            selected_hook = (selected_hook or "").strip()
             if selected_hook in hooks:
                 return selected_hook
-            return hooks[0]  # Fallback to first hook if no match found
+            return hook  # Fall back to the local match
         except Exception as e:
             print(f"Error generating hook: {str(e)}")
             return "" 
 
-    def _create_tweet(self, content: str, url: str) -> Optional[str]:
+    async def _create_tweet(self, content: str, url: str, bypass_cache: bool = False) -> Optional[str]:
         """Create a tweet-worthy summary from the processed content."""
         try:
             url_length = len(url) + 1
             max_tweet_length = 280 - url_length
 
-            response = self.client.chat.completions.create(
+            tweet = await acached_chat_completion(
+                self.async_client,
                 model="gpt-4",
                 messages=[
                     {
@@ -177,10 +168,11 @@ Write a natural-sounding tweet that makes people want to read this article. Keep
                     }
                 ],
                 max_tokens=100,
-                temperature=0.7
+                temperature=0.7,
+                bypass_cache=bypass_cache
             )
 
-            tweet = response.choices[0].message.content.strip()
+            tweet = tweet.strip()
             
             # Handle tweet length without truncation
             if len(tweet) > max_tweet_length:
@@ -201,4 +193,15 @@ Write a natural-sounding tweet that makes people want to read this article. Keep
 
         except Exception as e:
             logger.error(f"Error creating tweet: {str(e)}")
-            return None 
\ No newline at end of file
+            return None
+
+_processor = None
+_processor_lock = threading.Lock()
+
+def get_article_processor() -> ArticleProcessor:
+    """Returns the shared, long-lived ArticleProcessor."""
+    global _processor
+    with _processor_lock:
+        if _processor is None:
+            _processor = ArticleProcessor()
+        return _processor
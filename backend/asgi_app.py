@@ -0,0 +1,410 @@
+"""ASGI version of the API in app.py.
+
+Handlers are coroutines: OpenAI and crawl4ai work is awaited on the shared
+background event loop and blocking clients (vision batches, the schedule journal, the
+server-sent event streams) run in worker threads, so one process can keep hundreds of requests in flight
+while they wait on I/O. Run it with:
+
+    uvicorn asgi_app:app --port 3000
+"""
+import asyncio
+import json
+import logging
+import sys
+import traceback
+from datetime import date, timedelta
+from pathlib import Path
+
+from quart import Quart, Response, jsonify, request
+from quart_cors import cors
+
+sys.path.append(str(Path(__file__).parent))
+
+from hooks_catalog import get_hooks_catalog
+from GPT4_make_scheduler import asplit_tweets_with_gpt4, stream_tweets_with_gpt4
+from vision_processor import get_vision_processor
+from article_processor import get_article_processor
+from social_media_processor import get_social_media_processor
+from event_loop import get_background_loop
+from instagram_sessions import get_instagram_pool
+from batch_processor import BATCH_MAX_URLS, process_batch
+from jobs import QueueFull, get_job_queue
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, render as render_metrics
+from rate_limiter import get_rate_limiter
+from schedule_journal import get_schedule_journal
+from schedule_store import get_schedule_store, get_sheets_mirror
+from slot_planner import CapacityPolicy
+from settings import configure_logging, credentials_path
+
+app = cors(Quart(__name__))
+
+configure_logging()
+logger = logging.getLogger(__name__)
+
+# Resume flushing anything a previous run left in the schedule journal
+get_schedule_journal()
+
+def _plan_schedule(tweets, policy):
+    """Dry-run slot plan for /api/schedule (imports the sheet first if the store is new)."""
+    get_sheets_mirror().bootstrap()
+    return get_schedule_store().add_tweets(tweets, policy=policy, dry_run=True)
+
+def _schedule_slots(start: date, end: date) -> dict:
+    """Reads /api/schedule/slots from the SQLite store (run in a worker thread)."""
+    store = get_schedule_store()
+    next_date, next_slot = store.next_free_slot()
+    return {
+        'slots': store.between(start, end),
+        'nextFreeSlot': {'date': next_date.isoformat(), 'slot': next_slot}
+    }
+
+@app.route('/api/schedule', methods=['POST'])
+async def schedule_tweets():
+    """Queue processed tweets for Google Sheets; the journal flusher writes them."""
+    try:
+        data = await request.get_json()
+        tweets = [tweet for tweet in data.get('tweets', '').split('\n\n') if tweet.strip()]
+
+        if not tweets:
+            return jsonify({'error': 'No tweets provided'}), 400
+
+        if not credentials_path.exists():
+            return jsonify({'error': f'Google credentials file not found at {credentials_path}'}), 400
+
+        try:
+            policy = CapacityPolicy.from_dict(data.get('policy'))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid policy: {e}'}), 400
+
+        if data.get('dryRun'):
+            # Plan against the current schedule without writing anything
+            return jsonify({
+                'plan': (await asyncio.to_thread(_plan_schedule, tweets, policy)).to_dict(),
+                'policy': policy.to_dict(),
+                'queuedAhead': (await asyncio.to_thread(get_schedule_journal().status))['pending']
+            })
+
+        batch_id = await asyncio.to_thread(get_schedule_journal().append, tweets, policy)
+
+        return jsonify({
+            'message': 'Tweets queued for scheduling',
+            'batchId': batch_id,
+            'queued': len(tweets),
+            'statusUrl': f'/api/schedule/status?batch={batch_id}'
+        }), 202
+
+    except Exception as e:
+        logger.error(f"Error details: {traceback.format_exc()}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/schedule/status', methods=['GET'])
+async def schedule_status():
+    """Report pending, flushed and failed journal entries (optionally for one batch)."""
+    return jsonify(await asyncio.to_thread(get_schedule_journal().status, request.args.get('batch')))
+
+@app.route('/api/schedule/slots', methods=['GET'])
+async def schedule_slots():
+    """List scheduled slots between two ISO dates (default: the next 30 days) from the local store."""
+    try:
+        start = date.fromisoformat(request.args['start']) if request.args.get('start') else date.today()
+        end = date.fromisoformat(request.args['end']) if request.args.get('end') else start + timedelta(days=30)
+    except ValueError:
+        return jsonify({'error': 'start and end must be YYYY-MM-DD dates'}), 400
+
+    return jsonify(await asyncio.to_thread(_schedule_slots, start, end))
+
+@app.route('/api/process-article', methods=['POST'])
+async def process_article():
+    """Process article URL and return tweet content."""
+    try:
+        data = await request.get_json()
+        url = data.get('url')
+
+        if not url:
+            return jsonify({'error': 'No URL provided'}), 400
+
+        content = await get_background_loop().run_async(
+            get_article_processor().process_url(url, bypass_cache=bool(data.get('bypassCache')))
+        )
+
+        if not content:
+            return jsonify({'error': 'Failed to process article'}), 400
+
+        return jsonify({
+            'tweet': content,  # The processed tweet
+            'articleContent': content  # The article content
+        })
+
+    except Exception as e:
+        logger.error(f"Error processing article: {traceback.format_exc()}")
+        return jsonify({'error': str(e)}), 500
+
+def _payload_response(payload):
+    """Serve a precompiled hooks payload, honouring If-None-Match and Accept-Encoding."""
+    status, body, headers = payload.respond(
+        request.headers.get('If-None-Match', ''), request.headers.get('Accept-Encoding', '')
+    )
+    return Response(body, status=status, headers=headers)
+
+@app.route('/api/hooks', methods=['GET'])
+async def get_hooks():
+    """API endpoint to get viral hooks."""
+    return _payload_response(get_hooks_catalog().all)
+
+@app.route('/api/hooks/search', methods=['GET'])
+async def search_hooks():
+    """Search hook templates by word or {placeholder}, one page at a time."""
+    try:
+        page = int(request.args.get('page', 1))
+        page_size = int(request.args.get('pageSize', 20))
+    except ValueError:
+        return jsonify({'error': 'page and pageSize must be integers'}), 400
+
+    category = request.args.get('category') or None
+    catalog = get_hooks_catalog()
+    if category and category not in catalog.categories:
+        return jsonify({"error": "Category not found"}), 404
+
+    return jsonify(catalog.search(request.args.get('q', ''), category, page, page_size))
+
+@app.route('/api/hooks/<category>', methods=['GET'])
+async def get_category_hooks(category):
+    """API endpoint to get hooks by category."""
+    payload = get_hooks_catalog().categories.get(category)
+    if payload is not None:
+        return _payload_response(payload)
+    return jsonify({"error": "Category not found"}), 404
+
+@app.route('/api/process-tweets', methods=['POST'])
+async def process_tweets():
+    """Process tweets without scheduling them."""
+    try:
+        form = await request.form
+        files = await request.files
+        raw_text_content = []
+
+        # Process images if they exist
+        image_files = files.getlist('images')
+        if image_files:
+            extracted_text = await asyncio.to_thread(
+                get_vision_processor().process_images, image_files, form.get('imageInstructions', '')
+            )
+            if extracted_text:
+                raw_text_content.extend(extracted_text)
+
+        # Process text tweets if they exist
+        text_tweets = form.get('tweets')
+        if text_tweets:
+            raw_text_content.append(text_tweets)
+
+        all_tweets = []
+        if raw_text_content:
+            combined_text = "\n\n".join(raw_text_content)
+            bypass_cache = form.get('bypassCache', '').lower() == 'true'
+            # forceRewrite always sends the text to GPT-4, even if it is already tweet-ready
+            local_fast_path = form.get('forceRewrite', '').lower() != 'true'
+            all_tweets = await get_background_loop().run_async(
+                asplit_tweets_with_gpt4(combined_text, bypass_cache=bypass_cache, local_fast_path=local_fast_path)
+            )
+
+        if not all_tweets:
+            return jsonify({'error': 'No tweets were generated from either images or text'}), 400
+
+        # Return processed tweets as a string
+        return jsonify({'processedTweets': "\n\n".join(all_tweets)})
+
+    except Exception as e:
+        logger.error(f"Error details: {traceback.format_exc()}")
+        return jsonify({'error': str(e)}), 500
+
+def _process_social_media_job(url, bypass_cache, progress):
+    """Background job body for /api/process-social-media (same contract as app.py)."""
+    content = get_social_media_processor().process_url_sync(
+        url, bypass_cache=bypass_cache, progress=progress
+    )
+    if not content:
+        return None
+
+    return {
+        'tweet': content,
+        'originalContent': content,
+        'sourceUrl': url
+    }
+
+async def _iterate_in_thread(iterator):
+    """Yields from a blocking iterator, pulling each item in a worker thread."""
+    done = object()
+    try:
+        while True:
+            item = await asyncio.to_thread(next, iterator, done)
+            if item is done:
+                return
+            yield item
+    finally:
+        try:
+            iterator.close()
+        except (AttributeError, ValueError):
+            pass  # Not a generator, or still running in its thread; it ends with the next item
+
+def _event_stream(events):
+    """Wraps an async iterator of server-sent event strings in a streaming response."""
+    response = Response(
+        events,
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.timeout = None  # Batches and job streams outlive Quart's response timeout
+    return response
+
+@app.route('/api/process-tweets/stream', methods=['POST'])
+async def process_tweets_stream():
+    """Process tweets like /api/process-tweets, streaming each tweet as a server-sent event."""
+    form = await request.form
+    files = await request.files
+    raw_text_content = []
+
+    # Process images if they exist
+    image_files = files.getlist('images')
+    if image_files:
+        extracted_text = await asyncio.to_thread(
+            get_vision_processor().process_images, image_files, form.get('imageInstructions', '')
+        )
+        if extracted_text:
+            raw_text_content.extend(extracted_text)
+
+    # Process text tweets if they exist
+    text_tweets = form.get('tweets')
+    if text_tweets:
+        raw_text_content.append(text_tweets)
+
+    if not raw_text_content:
+        return jsonify({'error': 'No tweets were generated from either images or text'}), 400
+
+    combined_text = "\n\n".join(raw_text_content)
+    bypass_cache = form.get('bypassCache', '').lower() == 'true'
+    local_fast_path = form.get('forceRewrite', '').lower() != 'true'
+
+    async def generate():
+        tweets = []
+        try:
+            # The streamed completion is read with a blocking client, one chunk per worker-thread hop
+            async for tweet in _iterate_in_thread(stream_tweets_with_gpt4(
+                combined_text, bypass_cache=bypass_cache, local_fast_path=local_fast_path
+            )):
+                yield f"event: tweet\ndata: {json.dumps({'index': len(tweets), 'tweet': tweet})}\n\n"
+                tweets.append(tweet)
+        except Exception as e:
+            logger.error(f"Error streaming tweets: {traceback.format_exc()}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+            return
+        processed_tweets = "\n\n".join(tweets)
+        yield f"event: done\ndata: {json.dumps({'processedTweets': processed_tweets})}\n\n"
+
+    return _event_stream(generate())
+
+@app.route('/api/process-social-media', methods=['POST'])
+async def process_social_media():
+    """Queue a social media URL for processing and return the job id."""
+    try:
+        data = await request.get_json()
+        url = data.get('url')
+
+        if not url:
+            return jsonify({'error': 'No URL provided'}), 400
+
+        job = get_job_queue().submit(
+            'social-media', _process_social_media_job, url, bool(data.get('bypassCache'))
+        )
+
+        return jsonify({
+            'jobId': job.id,
+            'status': job.status,
+            'statusUrl': f'/api/jobs/{job.id}',
+            'eventsUrl': f'/api/jobs/{job.id}/events'
+        }), 202
+
+    except QueueFull as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        logger.error(f"Error processing social media: {traceback.format_exc()}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/process-batch', methods=['POST'])
+async def process_batch_urls():
+    """Process a list of URLs concurrently, streaming each result as server-sent events."""
+    data = await request.get_json() or {}
+    urls = [url.strip() for url in data.get('urls', []) if isinstance(url, str) and url.strip()]
+
+    if not urls:
+        return jsonify({'error': 'No URLs provided'}), 400
+    if len(urls) > BATCH_MAX_URLS:
+        return jsonify({'error': f'At most {BATCH_MAX_URLS} URLs per batch'}), 400
+
+    bypass_cache = bool(data.get('bypassCache'))
+
+    async def generate():
+        succeeded = failed = 0
+        async for result in _iterate_in_thread(process_batch(urls, bypass_cache=bypass_cache)):
+            if 'error' in result:
+                failed += 1
+            else:
+                succeeded += 1
+            yield f"event: result\ndata: {json.dumps(result)}\n\n"
+        summary = {'total': len(urls), 'succeeded': succeeded, 'failed': failed}
+        yield f"event: done\ndata: {json.dumps(summary)}\n\n"
+
+    return _event_stream(generate())
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+async def get_job(job_id):
+    """Return the status, stage and (when finished) the result of a job."""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>', methods=['DELETE'])
+async def cancel_job(job_id):
+    """Cancel a queued or running job."""
+    job = get_job_queue().cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/jobs/<job_id>/events', methods=['GET'])
+async def job_events(job_id):
+    """Stream a job's progress as server-sent events."""
+    queue = get_job_queue()
+    if queue.get(job_id) is None:
+        return jsonify({'error': 'Job not found'}), 404
+
+    async def generate():
+        async for event in _iterate_in_thread(queue.events(job_id)):
+            if event is None:
+                yield ": keep-alive\n\n"
+                continue
+            yield f"event: stage\ndata: {json.dumps(event)}\n\n"
+        job = queue.get(job_id)
+        if job is not None:
+            yield f"event: done\ndata: {json.dumps(job.to_dict())}\n\n"
+
+    return _event_stream(generate())
+
+@app.route('/api/rate-limits', methods=['GET'])
+async def get_rate_limits():
+    """Report OpenAI admission queue depth, per-model bucket state and Instagram session budgets."""
+    limiter = get_rate_limiter()
+    return jsonify({
+        'queueDepth': limiter.queue_depth(),
+        'models': limiter.stats(),
+        'instagram': get_instagram_pool().stats()
+    })
+
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    """Stage timings, token usage and cache hit rates in the Prometheus text format."""
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, port=3000)
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import ffmpeg
+import yt_dlp
+
+from metrics import span
+from rate_limiter import acall_openai
+
+logger = logging.getLogger(__name__)
+
+# Whisper works on 16 kHz mono internally, so anything richer is wasted upload
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_BITRATE = os.getenv('AUDIO_BITRATE', '32k')
+# Ten minutes of 32 kbps mono is ~2.4 MB, far below the 25 MB upload cap
+SEGMENT_SECONDS = int(os.getenv('AUDIO_SEGMENT_SECONDS', '600'))
+SEGMENT_OVERLAP_SECONDS = int(os.getenv('AUDIO_SEGMENT_OVERLAP_SECONDS', '3'))
+TRANSCRIPTION_WORKERS = int(os.getenv('TRANSCRIPTION_WORKERS', '4'))
+
+def download_audio(url: str, workdir: Path) -> Tuple[dict, str]:
+    """Downloads only the best audio stream of a video into workdir.
+
+    Returns the yt-dlp info dict and the path of the downloaded file.
+    """
+    ydl_opts = {
+        'format': 'bestaudio/best',  # Audio-only stream, full file only as a last resort
+        'quiet': True,
+        'outtmpl': str(Path(workdir) / '%(id)s.%(ext)s'),
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=True)
+        return info, ydl.prepare_filename(info)
+
+def probe_duration(path: str) -> float:
+    """Returns the media duration in seconds (0 if it cannot be determined)."""
+    try:
+        return float(ffmpeg.probe(path)['format']['duration'])
+    except (ffmpeg.Error, KeyError, ValueError) as e:
+        logger.warning(f"Could not probe duration of {path}: {e}")
+        return 0.0
+
+def transcode_segment(source: str, target: str, start: float = 0.0, length: Optional[float] = None) -> str:
+    """Transcodes (part of) a media file to compact mono MP3 and returns the target path."""
+    input_args = {'ss': start} if start else {}
+    if length is not None:
+        input_args['t'] = length
+    (
+        ffmpeg
+        .input(source, **input_args)
+        .output(target, vn=None, ac=1, ar=AUDIO_SAMPLE_RATE, audio_bitrate=AUDIO_BITRATE, acodec='libmp3lame')
+        .overwrite_output()
+        .run(quiet=True)
+    )
+    return target
+
+def split_audio(source: str, workdir: Path) -> List[str]:
+    """Transcodes a file into overlapping mono segments, in playback order."""
+    duration = probe_duration(source)
+    if duration <= SEGMENT_SECONDS:
+        return [transcode_segment(source, str(Path(workdir) / 'segment_000.mp3'))]
+
+    step = SEGMENT_SECONDS - SEGMENT_OVERLAP_SECONDS
+    starts = []
+    start = 0.0
+    while start < duration:
+        starts.append(start)
+        start += step
+
+    with ThreadPoolExecutor(max_workers=TRANSCRIPTION_WORKERS) as executor:
+        futures = [
+            executor.submit(
+                transcode_segment, source, str(Path(workdir) / f'segment_{i:03d}.mp3'),
+                start, SEGMENT_SECONDS
+            )
+            for i, start in enumerate(starts)
+        ]
+        return [future.result() for future in futures]
+
+def stitch_transcripts(parts: List[str], max_overlap_words: int = 40) -> str:
+    """Joins segment transcripts, dropping words repeated across an overlap."""
+    words: List[str] = []
+    for part in parts:
+        next_words = part.split()
+        overlap = 0
+        max_size = min(max_overlap_words, len(words), len(next_words))
+        for size in range(max_size, 0, -1):
+            tail = [_normalize_word(w) for w in words[-size:]]
+            head = [_normalize_word(w) for w in next_words[:size]]
+            if tail == head:
+                overlap = size
+                break
+        words.extend(next_words[overlap:])
+    return ' '.join(words)
+
+def _normalize_word(word: str) -> str:
+    return re.sub(r'[^\w]', '', word).lower()
+
+async def transcribe_audio(client, source: str, workdir: Path) -> str:
+    """Transcribes a media file with whisper-1 using an AsyncOpenAI client.
+
+    Transcoding runs in a worker thread; the segments are then uploaded
+    concurrently and their text is stitched back in playback order.
+    """
+    with span('transcode'):
+        segments = await asyncio.to_thread(split_audio, source, workdir)
+
+    async def transcribe(path: str) -> str:
+        with open(path, 'rb') as audio_file:
+            # Whisper is limited by requests, not tokens
+            return await acall_openai(
+                "whisper-1",
+                0,
+                client.audio.transcriptions.create,
+                file=audio_file,
+                response_format="text"
+            )
+
+    with span('transcription', model='whisper-1'):
+        parts = await asyncio.gather(*(transcribe(path) for path in segments))
+    if len(parts) == 1:
+        return parts[0]
+    return stitch_transcripts(parts)
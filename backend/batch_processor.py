@@ -0,0 +1,57 @@
+import logging
+import os
+from concurrent.futures import as_completed
+from typing import Iterator, List
+
+from event_loop import get_background_loop
+from social_media_processor import get_social_media_processor
+
+logger = logging.getLogger(__name__)
+
+BATCH_MAX_URLS = int(os.getenv('BATCH_MAX_URLS', '50'))
+
+async def _process_one(index: int, url: str, platform: str, bypass_cache: bool) -> dict:
+    """Processes one URL; the processors cap each platform's download or crawl stage."""
+    result = {'index': index, 'url': url, 'platform': platform}
+    try:
+        tweet = await get_social_media_processor().process_url(url, bypass_cache=bypass_cache)
+        if tweet:
+            result['tweet'] = tweet
+        else:
+            result['error'] = f"Failed to process {platform} content"
+    except Exception as e:
+        logger.error(f"Batch item {url} failed: {str(e)}")
+        result['error'] = str(e)
+    return result
+
+def process_batch(urls: List[str], bypass_cache: bool = False) -> Iterator[dict]:
+    """Processes URLs concurrently and yields each result as soon as it is ready.
+
+    Every result carries the URL's position in the request ('index'). Failures
+    are reported per URL in 'error' and never stop the rest of the batch.
+    """
+    processor = get_social_media_processor()
+    jobs = []
+    for index, url in enumerate(urls):
+        try:
+            platform = processor._detect_platform(url)
+        except Exception as e:
+            yield {'index': index, 'url': url, 'platform': None, 'error': str(e)}
+            continue
+        jobs.append((index, url, platform))
+
+    if not jobs:
+        return
+
+    # Every URL runs as a task on the background loop; the per-platform limits
+    # alone decide what proceeds, so a busy platform never holds up the others
+    loop = get_background_loop()
+    futures = [loop.submit(_process_one(index, url, platform, bypass_cache))
+               for index, url, platform in jobs]
+    try:
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        # Stop outstanding work if the client goes away mid-stream
+        for future in futures:
+            future.cancel()
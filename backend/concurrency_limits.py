@@ -0,0 +1,130 @@
+import asyncio
+import os
+import threading
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Optional
+
+# Process-wide caps on concurrent work per backend resource. Platform groups
+# bound how many downloads/crawls run at once; 'openai' bounds in-flight API calls.
+LIMITS = {
+    'crawler': int(os.getenv('LIMIT_CRAWLER', '2')),
+    'yt-dlp': int(os.getenv('LIMIT_YT_DLP', '3')),
+    'instagram': int(os.getenv('LIMIT_INSTAGRAM', '1')),
+    'openai': int(os.getenv('LIMIT_OPENAI', '8')),
+}
+
+# Which resource group each detected platform draws from
+PLATFORM_GROUPS = {
+    'article': 'crawler',
+    'tiktok': 'yt-dlp',
+    'youtube': 'yt-dlp',
+    'instagram': 'instagram',
+}
+
+class _Waiter:
+    """A queued acquire: a thread waiting on an Event, or a coroutine waiting on a future."""
+
+    def __init__(self, event: Optional[threading.Event] = None,
+                 loop: Optional[asyncio.AbstractEventLoop] = None, future: Optional[asyncio.Future] = None):
+        self.event = event
+        self.loop = loop
+        self.future = future
+        self.granted = False
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+class Limit:
+    """A counting semaphore shared by threads and coroutines that serves waiters in arrival order.
+
+    A released permit is handed straight to the oldest waiter, sync or async,
+    so neither kind can starve the other. Threads block on an Event; coroutines
+    await a future that release() resolves with call_soon_threadsafe.
+    """
+
+    def __init__(self, value: int):
+        self.value = value
+        self._free = value
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            waiter = _Waiter(event=threading.Event())
+            self._waiters.append(waiter)
+        waiter.event.wait()
+
+    async def acquire_async(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._free and not self._waiters:
+                self._free -= 1
+                return
+            waiter = _Waiter(loop=loop, future=loop.create_future())
+            self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters.remove(waiter)
+            if granted:
+                # The permit was handed over as we were cancelled; pass it on
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                if self._free >= self.value:
+                    raise ValueError("Limit released too many times")
+                self._free += 1
+                return
+            waiter = self._waiters.popleft()
+            waiter.granted = True
+        if waiter.event is not None:
+            waiter.event.set()
+            return
+        try:
+            waiter.loop.call_soon_threadsafe(_wake, waiter.future)
+        except RuntimeError:
+            # The waiter's loop has closed; nobody will take this permit
+            self.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+_limits = {name: Limit(value) for name, value in LIMITS.items()}
+
+def limit(name: str) -> Limit:
+    """Returns the limit for a resource group; use it as a context manager."""
+    return _limits[name]
+
+@asynccontextmanager
+async def async_limit(name: str):
+    """Async form of limit(): waits for the same limit without blocking the event loop.
+
+    Waiting coroutines queue alongside blocked threads and hold no executor
+    thread; a waiter cancelled while queued leaves the queue, and one cancelled
+    just as it was handed a permit passes the permit on.
+    """
+    shared = _limits[name]
+    await shared.acquire_async()
+    try:
+        yield
+    finally:
+        shared.release()
+
+def async_platform_limit(platform: str):
+    """Async limit guarding a platform's download or crawl stage; hold it only around that stage."""
+    return async_limit(PLATFORM_GROUPS[platform])
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+import os
+import threading
+from typing import Optional
+
+from crawl4ai import AsyncWebCrawler
+
+from event_loop import get_background_loop
+
+logger = logging.getLogger(__name__)
+
+CRAWLER_POOL_SIZE = int(os.getenv('CRAWLER_POOL_SIZE', '2'))
+CRAWLER_MAX_PAGES = int(os.getenv('CRAWLER_MAX_PAGES', '50'))
+CRAWLER_MAX_WAITERS = int(os.getenv('CRAWLER_MAX_WAITERS', '20'))
+CRAWLER_ACQUIRE_TIMEOUT = float(os.getenv('CRAWLER_ACQUIRE_TIMEOUT', '60'))
+
+class PoolExhausted(Exception):
+    """Raised when too many requests are already waiting for a crawler."""
+
+class _PooledCrawler:
+    """A started AsyncWebCrawler and the number of pages it has served."""
+
+    def __init__(self, crawler: AsyncWebCrawler):
+        self.crawler = crawler
+        self.pages = 0
+
+class CrawlerPool:
+    """Warm headless browsers shared by all article requests.
+
+    The pool lives on the process-wide background event loop. Browsers are started once,
+    health-checked on every checkout and recycled after max_pages pages.
+    Callers beyond max_waiters are rejected instead of queueing forever.
+    """
+
+    def __init__(
+        self,
+        size: int = CRAWLER_POOL_SIZE,
+        max_pages: int = CRAWLER_MAX_PAGES,
+        max_waiters: int = CRAWLER_MAX_WAITERS,
+        acquire_timeout: float = CRAWLER_ACQUIRE_TIMEOUT
+    ):
+        self.size = size
+        self.max_pages = max_pages
+        self.max_waiters = max_waiters
+        self.acquire_timeout = acquire_timeout
+
+        self._background = get_background_loop()
+
+        self._idle: Optional[asyncio.Queue] = None
+        self._waiters = 0
+        self._started = self._background.submit(self._start())
+
+    async def _start(self):
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            try:
+                self._idle.put_nowait(await self._new_crawler())
+            except Exception as e:
+                logger.error(f"Could not start crawler: {str(e)}")
+                self._idle.put_nowait(None)
+
+    async def _new_crawler(self) -> _PooledCrawler:
+        crawler = AsyncWebCrawler()
+        await crawler.start()
+        return _PooledCrawler(crawler)
+
+    async def _close(self, pooled: _PooledCrawler):
+        try:
+            await pooled.crawler.close()
+        except Exception as e:
+            logger.warning(f"Error closing crawler: {str(e)}")
+
+    @staticmethod
+    def _is_healthy(pooled: _PooledCrawler) -> bool:
+        """Checks that the crawler's browser is still connected, where that can be seen."""
+        strategy = getattr(pooled.crawler, 'crawler_strategy', None)
+        browser = getattr(strategy, 'browser', None)
+        if browser is None:
+            browser = getattr(getattr(strategy, 'browser_manager', None), 'browser', None)
+        is_connected = getattr(browser, 'is_connected', None)
+        return is_connected() if callable(is_connected) else True
+
+    def _give_back(self, getter: asyncio.Future):
+        """Returns a crawler a cancelled or timed-out wait had already taken off the queue."""
+        if getter.done() and not getter.cancelled() and getter.exception() is None:
+            self._idle.put_nowait(getter.result())
+        else:
+            getter.cancel()
+
+    async def _acquire(self) -> _PooledCrawler:
+        """Checks out a healthy crawler, waiting for one to be released if needed."""
+        if self._waiters >= self.max_waiters:
+            raise PoolExhausted(f"{self._waiters} requests already waiting for a browser")
+        self._waiters += 1
+        # Not wait_for: before Python 3.12 it can drop an item the get() already took
+        getter = asyncio.ensure_future(self._idle.get())
+        try:
+            await asyncio.wait({getter}, timeout=self.acquire_timeout)
+        except BaseException:
+            self._give_back(getter)
+            raise
+        finally:
+            self._waiters -= 1
+        if not getter.done():
+            getter.cancel()
+            raise asyncio.TimeoutError(f"No browser free after {self.acquire_timeout:g}s")
+        pooled = getter.result()
+
+        try:
+            if pooled is None:
+                # An earlier restart failed; try again now
+                pooled = await self._new_crawler()
+            elif not self._is_healthy(pooled):
+                logger.info("Replacing unhealthy crawler")
+                await self._close(pooled)
+                pooled = await self._new_crawler()
+        except BaseException:
+            # Including cancellation mid-start: the slot goes back, to be refilled on its next checkout
+            self._idle.put_nowait(None)
+            raise
+        return pooled
+
+    async def _release(self, pooled: _PooledCrawler, broken: bool = False):
+        replacement = pooled
+        try:
+            if broken or pooled.pages >= self.max_pages:
+                replacement = None  # The slot is refilled on its next checkout
+                await self._close(pooled)
+                try:
+                    replacement = await self._new_crawler()
+                except Exception as e:
+                    logger.error(f"Could not start replacement crawler: {str(e)}")
+        finally:
+            # Even when cancelled, so the pool never loses a slot
+            self._idle.put_nowait(replacement)
+
+    async def _crawl(self, url: str, **kwargs):
+        await asyncio.wrap_future(self._started)
+        pooled = await self._acquire()
+        broken = False
+        try:
+            pooled.pages += 1
+            return await pooled.crawler.arun(url=url, **kwargs)
+        except Exception:
+            broken = not self._is_healthy(pooled)
+            raise
+        finally:
+            await self._release(pooled, broken)
+
+    async def crawl(self, url: str, **kwargs):
+        """Crawls a URL with a warm browser; awaitable from any event loop."""
+        return await self._background.run_async(self._crawl(url, **kwargs))
+
+    def crawl_sync(self, url: str, **kwargs):
+        """Blocking variant of crawl for threads without an event loop."""
+        return self._background.run(self._crawl(url, **kwargs))
+
+    def stats(self) -> dict:
+        idle = self._idle.qsize() if self._idle is not None else 0
+        return {'size': self.size, 'idle': idle, 'waiting': self._waiters}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_crawler_pool() -> CrawlerPool:
+    """Returns the process-wide crawler pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = CrawlerPool()
+        return _pool
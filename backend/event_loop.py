@@ -0,0 +1,52 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Awaitable, Optional, TypeVar
+
+T = TypeVar('T')
+
+class BackgroundLoop:
+    """One asyncio event loop running forever in a daemon thread.
+
+    Flask handlers (and other threads) hand coroutines to it instead of calling
+    asyncio.run, so I/O from different requests overlaps on the same loop.
+    """
+
+    def __init__(self, name: str = 'background-loop'):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(self, coro: Awaitable[T]) -> Future:
+        """Schedules a coroutine on the loop and returns a concurrent future."""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: Awaitable[T], timeout: Optional[float] = None) -> T:
+        """Runs a coroutine on the loop and blocks the calling thread for its result."""
+        if self.in_loop_thread():
+            raise RuntimeError("BackgroundLoop.run() would deadlock inside the loop; await instead")
+        return self.submit(coro).result(timeout)
+
+    async def run_async(self, coro: Awaitable[T]) -> T:
+        """Awaits a coroutine on the loop from any other event loop."""
+        if self.in_loop_thread():
+            return await coro
+        return await asyncio.wrap_future(self.submit(coro))
+
+    def in_loop_thread(self) -> bool:
+        return threading.current_thread() is self._thread
+
+_loop = None
+_loop_lock = threading.Lock()
+
+def get_background_loop() -> BackgroundLoop:
+    """Returns the process-wide background event loop, starting it on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = BackgroundLoop()
+        return _loop
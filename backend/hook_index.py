@@ -0,0 +1,115 @@
+"""Local TF-IDF index over VIRAL_HOOKS for picking a hook category and template."""
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from hooks_config import VIRAL_HOOKS
+
+WORD_PATTERN = re.compile(r"[a-z][a-z']+")
+PLACEHOLDER_PATTERN = re.compile(r'\{[^}]*\}')
+STOP_WORDS = frozenset(
+    "a an and are as at be but by for from has have how i if in is it its me my of on or our "
+    "so that the their them there these they this to was we what when which who why will with "
+    "you your here".split()
+)
+
+# What each category's content looks like, mirroring the old classification prompt
+CATEGORY_DESCRIPTIONS = {
+    "question": "how to guide tutorial learn steps tips educational explain ways improve beginner question why",
+    "challenge": "myth wrong mistake lie misconception contrarian truth actually belief debunk overrated everyone thinks",
+    "story": "story journey experience case study failed lesson learned years ago started personal went from",
+    "authority": "expert research study scientists professor interview insider leader report according analysis found",
+    "stats": "percent percentage data statistics numbers survey growth million billion rate increase decrease chart",
+}
+
+# Below this cosine margin between the top two categories the match is not trusted
+LOW_CONFIDENCE_MARGIN = 0.02
+
+def tokenize(text: str) -> List[str]:
+    text = PLACEHOLDER_PATTERN.sub(' ', text.lower())
+    return [word for word in WORD_PATTERN.findall(text) if word not in STOP_WORDS]
+
+def _normalize(vector: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(value * value for value in vector.values()))
+    return {term: value / norm for term, value in vector.items()} if norm else {}
+
+def _cosine(left: Dict[str, float], right: Dict[str, float]) -> float:
+    if len(left) > len(right):
+        left, right = right, left
+    return sum(value * right.get(term, 0.0) for term, value in left.items())
+
+class HookIndex:
+    """TF-IDF vectors for every hook category and template, built once."""
+
+    def __init__(self, hooks: dict):
+        self.hooks = hooks
+        documents: List[Tuple[str, Optional[int], List[str]]] = []
+        for category, data in hooks.items():
+            examples = data.get("examples", [])
+            category_text = " ".join([data.get("title", ""), CATEGORY_DESCRIPTIONS.get(category, "")] + examples)
+            documents.append((category, None, tokenize(category_text)))
+            for position, template in enumerate(examples):
+                documents.append((category, position, tokenize(template)))
+
+        document_frequency = Counter()
+        for _, _, tokens in documents:
+            document_frequency.update(set(tokens))
+        total = len(documents)
+        self.idf = {term: math.log((1 + total) / (1 + count)) + 1 for term, count in document_frequency.items()}
+
+        self.category_vectors: Dict[str, Dict[str, float]] = {}
+        self.template_vectors: Dict[str, List[Dict[str, float]]] = {category: [] for category in hooks}
+        for category, position, tokens in documents:
+            vector = self.vectorize_tokens(tokens)
+            if position is None:
+                self.category_vectors[category] = vector
+            else:
+                self.template_vectors[category].append(vector)
+
+    def vectorize_tokens(self, tokens: List[str]) -> Dict[str, float]:
+        counts = Counter(token for token in tokens if token in self.idf)
+        return _normalize({term: (1 + math.log(count)) * self.idf[term] for term, count in counts.items()})
+
+    def rank_categories(self, content: str) -> List[Tuple[str, float]]:
+        """Returns (category, similarity) pairs, best first."""
+        vector = self.vectorize_tokens(tokenize(content))
+        scores = [(category, _cosine(vector, category_vector))
+                  for category, category_vector in self.category_vectors.items()]
+        return sorted(scores, key=lambda item: item[1], reverse=True)
+
+    def best_template(self, category: str, content: str) -> str:
+        """Returns the category's template closest to the content (the first one on ties)."""
+        examples = self.hooks[category]["examples"]
+        vector = self.vectorize_tokens(tokenize(content))
+        scores = [_cosine(vector, template_vector) for template_vector in self.template_vectors[category]]
+        best = max(range(len(examples)), key=lambda i: (scores[i], -i))
+        return examples[best]
+
+    def select(self, content: str) -> Tuple[str, str, float]:
+        """Picks (category, template, confidence); confidence is the top-two category margin."""
+        ranked = self.rank_categories(content)
+        category, top_score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if top_score == 0.0:
+            category = "question" if "question" in self.hooks else category
+        return category, self.best_template(category, content), top_score - runner_up
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_hook_index() -> HookIndex:
+    """Returns the process-wide hook index, building it on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = HookIndex(VIRAL_HOOKS)
+        return _index
+
+def rebuild_hook_index(hooks: dict) -> HookIndex:
+    """Replaces the process-wide index, e.g. after the hooks file is regenerated."""
+    global _index
+    with _index_lock:
+        _index = HookIndex(hooks)
+        return _index
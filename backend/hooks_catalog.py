@@ -0,0 +1,165 @@
+"""Precompiled /api/hooks payloads and a search index over the hook templates.
+
+Payloads are serialized and gzipped once, with a strong ETag per encoding, and rebuilt
+whenever shared/hooks.json (the file scripts/sync_hooks.py generates from)
+changes on disk.
+"""
+import bisect
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from hooks_config import VIRAL_HOOKS
+
+HOOKS_JSON_PATH = Path(__file__).parent.parent / 'shared' / 'hooks.json'
+# How often (seconds) the source file's mtime is checked
+RELOAD_CHECK_INTERVAL = 2.0
+MAX_PAGE_SIZE = 100
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+PLACEHOLDER_PATTERN = re.compile(r'\{(\w+)\}')
+QUERY_PATTERN = re.compile(r"\{\w+\}|[a-z0-9']+")
+
+class Payload:
+    """A serialized response body with its gzip form and strong ETag."""
+
+    def __init__(self, data):
+        self.body = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, compresslevel=9)
+        digest = hashlib.sha256(self.body).hexdigest()[:32]
+        # Each encoding is its own representation, so each gets its own strong ETag
+        self.etag = f'"{digest}"'
+        self.gzip_etag = f'"{digest}-gz"'
+
+    def respond(self, if_none_match: str = '', accept_encoding: str = '') -> Tuple[int, bytes, Dict[str, str]]:
+        """Returns (status, body, headers): 304 on a matching ETag, gzip when the client accepts it."""
+        use_gzip = 'gzip' in accept_encoding.lower()
+        headers = {
+            'ETag': self.gzip_etag if use_gzip else self.etag,
+            'Cache-Control': 'no-cache',  # Always revalidate; the ETag makes that a 304
+            'Vary': 'Accept-Encoding',
+            'Content-Type': 'application/json'
+        }
+        # Either tag names the same content, whichever encoding the client cached
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        if self.etag in tags or self.gzip_etag in tags or if_none_match.strip() == '*':
+            return 304, b'', headers
+        if use_gzip:
+            headers['Content-Encoding'] = 'gzip'
+            return 200, self.gzip_body, headers
+        return 200, self.body, headers
+
+class HooksCatalog:
+    """Serialized payloads plus an inverted index for one version of the hooks."""
+
+    def __init__(self, hooks: dict):
+        self.hooks = hooks
+        self.all = Payload(hooks)
+        self.categories = {category: Payload(data) for category, data in hooks.items()}
+        self.titles = {category: data.get('title', category) for category, data in hooks.items()}
+
+        # Entries are (category, position); terms map to the entries containing them
+        self.entries: List[Tuple[str, int]] = []
+        self.word_index: Dict[str, Set[int]] = {}
+        self.placeholder_index: Dict[str, Set[int]] = {}
+        for category, data in hooks.items():
+            for position, template in enumerate(data.get('examples', [])):
+                entry_id = len(self.entries)
+                self.entries.append((category, position))
+                for placeholder in PLACEHOLDER_PATTERN.findall(template):
+                    self.placeholder_index.setdefault(placeholder.lower(), set()).add(entry_id)
+                for word in WORD_PATTERN.findall(PLACEHOLDER_PATTERN.sub(' ', template.lower())):
+                    self.word_index.setdefault(word, set()).add(entry_id)
+        self._words = sorted(self.word_index)
+
+    def _matches(self, term: str) -> Set[int]:
+        """Entries matching one query term: {placeholder}, or a word prefix."""
+        placeholder = PLACEHOLDER_PATTERN.fullmatch(term)
+        if placeholder:
+            return set(self.placeholder_index.get(placeholder.group(1).lower(), ()))
+
+        matches = set(self.placeholder_index.get(term, ()))
+        # Prefix match over the sorted vocabulary, so partial words work while typing
+        start = bisect.bisect_left(self._words, term)
+        for word in self._words[start:]:
+            if not word.startswith(term):
+                break
+            matches |= self.word_index[word]
+        return matches
+
+    def search(self, query: str = '', category: Optional[str] = None, page: int = 1,
+               page_size: int = 20) -> dict:
+        """Returns one page of templates matching every query term (optionally in one category)."""
+        terms = QUERY_PATTERN.findall(query.lower())
+        if terms:
+            entry_ids = self._matches(terms[0])
+            for term in terms[1:]:
+                entry_ids &= self._matches(term)
+            entry_ids = sorted(entry_ids)
+        else:
+            entry_ids = list(range(len(self.entries)))
+
+        if category:
+            entry_ids = [entry_id for entry_id in entry_ids if self.entries[entry_id][0] == category]
+
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        page = max(1, page)
+        selected = entry_ids[(page - 1) * page_size:page * page_size]
+
+        results = []
+        for entry_id in selected:
+            entry_category, position = self.entries[entry_id]
+            template = self.hooks[entry_category]['examples'][position]
+            results.append({
+                'category': entry_category,
+                'template': template,
+                'placeholders': PLACEHOLDER_PATTERN.findall(template)
+            })
+
+        return {
+            'query': query,
+            'category': category,
+            'page': page,
+            'pageSize': page_size,
+            'total': len(entry_ids),
+            'categories': self.titles,
+            'results': results
+        }
+
+_catalog = None
+_catalog_mtime = None
+_last_check = 0.0
+_catalog_lock = threading.Lock()
+
+def get_hooks_catalog() -> HooksCatalog:
+    """Returns the current catalog, rebuilding it if shared/hooks.json has changed."""
+    global _catalog, _catalog_mtime, _last_check
+    with _catalog_lock:
+        now = time.monotonic()
+        if _catalog is not None and now - _last_check < RELOAD_CHECK_INTERVAL:
+            return _catalog
+        _last_check = now
+
+        try:
+            mtime = os.stat(HOOKS_JSON_PATH).st_mtime
+        except OSError:
+            mtime = None
+
+        if _catalog is None or mtime != _catalog_mtime:
+            hooks = VIRAL_HOOKS
+            if mtime is not None:
+                with open(HOOKS_JSON_PATH, encoding='utf-8') as f:
+                    hooks = json.load(f)
+            if mtime is not None or _catalog is not None:
+                # Keep the hook classifier in step with the served templates
+                from hook_index import rebuild_hook_index
+                rebuild_hook_index(hooks)
+            _catalog = HooksCatalog(hooks)
+            _catalog_mtime = mtime
+        return _catalog
@@ -0,0 +1,107 @@
+import hashlib
+import io
+import math
+import os
+from typing import List, Optional
+
+from PIL import Image, ImageOps
+
+# gpt-4o-mini (detail=high) fits images into 2048x2048, then scales the short side to 768
+VISION_MAX_SIDE = 2048
+VISION_SHORT_SIDE = 768
+VISION_TILE_SIZE = 512
+VISION_BASE_TOKENS = 85
+VISION_TILE_TOKENS = 170
+
+JPEG_QUALITY = int(os.getenv('VISION_JPEG_QUALITY', '85'))
+BATCH_MAX_IMAGES = int(os.getenv('VISION_BATCH_MAX_IMAGES', '4'))
+BATCH_MAX_IMAGE_TOKENS = int(os.getenv('VISION_BATCH_MAX_IMAGE_TOKENS', '3000'))
+BATCH_MAX_BYTES = int(os.getenv('VISION_BATCH_MAX_BYTES', str(8 * 1024 * 1024)))
+
+class PreparedImage:
+    """An uploaded image resized and re-encoded for the vision model."""
+
+    def __init__(self, index: int, data: bytes, width: int, height: int, digest: str):
+        self.index = index  # Position in the upload
+        self.data = data
+        self.mime_type = 'image/jpeg'
+        self.width = width
+        self.height = height
+        self.digest = digest  # Hash of the resized pixels, for exact duplicates
+
+    @property
+    def tokens(self) -> int:
+        """Estimated input tokens for this image at detail=high."""
+        tiles = math.ceil(self.width / VISION_TILE_SIZE) * math.ceil(self.height / VISION_TILE_SIZE)
+        return VISION_BASE_TOKENS + VISION_TILE_TOKENS * tiles
+
+def _target_size(width: int, height: int):
+    """Returns the size the vision model would scale an image to (never upscaling)."""
+    scale = min(1.0, VISION_MAX_SIDE / max(width, height))
+    short_side = min(width, height) * scale
+    if short_side > VISION_SHORT_SIDE:
+        scale *= VISION_SHORT_SIDE / short_side
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def pixel_digest(image: Image.Image) -> str:
+    """SHA-256 of the decoded pixels, so re-encoded copies of one image still match."""
+    return hashlib.sha256(image.tobytes()).hexdigest()
+
+def prepare_image(image_file, index: int) -> Optional[PreparedImage]:
+    """Downsizes and recompresses one uploaded file; returns None if it is not an image."""
+    try:
+        image_file.seek(0)
+        image = Image.open(image_file)
+        image = ImageOps.exif_transpose(image)
+    except Exception as e:
+        print(f"Error reading image: {str(e)}")
+        return None
+
+    if image.mode in ('RGBA', 'LA', 'P'):
+        # Flatten transparency onto white, as screenshots usually are
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.split()[-1])
+        image = background
+    else:
+        image = image.convert('RGB')
+
+    width, height = _target_size(*image.size)
+    if (width, height) != image.size:
+        image = image.resize((width, height), Image.LANCZOS)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+    return PreparedImage(index, buffer.getvalue(), width, height, pixel_digest(image))
+
+def drop_duplicates(images: List[PreparedImage]) -> List[PreparedImage]:
+    """Keeps the first of any images with identical pixels.
+
+    Only exact copies are dropped: screenshots that share a layout but differ
+    in wording must all reach the model.
+    """
+    kept: List[PreparedImage] = []
+    seen = set()
+    for image in images:
+        if image.digest not in seen:
+            seen.add(image.digest)
+            kept.append(image)
+    return kept
+
+def make_batches(images: List[PreparedImage]) -> List[List[PreparedImage]]:
+    """Groups images, in upload order, under the per-request image, token and size budgets."""
+    batches: List[List[PreparedImage]] = []
+    current: List[PreparedImage] = []
+    tokens = size = 0
+    for image in images:
+        if current and (len(current) >= BATCH_MAX_IMAGES or
+                        tokens + image.tokens > BATCH_MAX_IMAGE_TOKENS or
+                        size + len(image.data) > BATCH_MAX_BYTES):
+            batches.append(current)
+            current, tokens, size = [], 0, 0
+        current.append(image)
+        tokens += image.tokens
+        size += len(image.data)
+    if current:
+        batches.append(current)
+    return batches
@@ -0,0 +1,271 @@
+"""Pool of long-lived Instaloader sessions for Instagram post lookups.
+
+Each Instagram account listed in INSTAGRAM_USERNAMES gets its own Instaloader
+whose cookies are loaded from a session file and written back as Instagram
+refreshes them. When no account is configured the pool holds one anonymous
+session. Lookups rotate across the sessions and every session keeps its own
+hourly budget; a session that gets throttled or logged out is rested and the
+lookup moves on to the next one instead of waiting on the same connection.
+
+Create a session file once with:
+
+    instaloader --login <username> --sessionfile backend/cache/instagram_sessions/session-<username>
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Callable, List, Optional, TypeVar
+
+from instaloader import Instaloader
+from instaloader.exceptions import (ConnectionException, LoginRequiredException,
+                                    QueryReturnedForbiddenException, TooManyRequestsException)
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+DEFAULT_SESSION_DIR = Path(__file__).parent / 'cache' / 'instagram_sessions'
+INSTAGRAM_LOOKUPS_PER_HOUR = int(os.getenv('INSTAGRAM_LOOKUPS_PER_HOUR', '120'))
+INSTAGRAM_ACQUIRE_TIMEOUT = float(os.getenv('INSTAGRAM_ACQUIRE_TIMEOUT', '60'))
+INSTAGRAM_LOOKUP_ATTEMPTS = int(os.getenv('INSTAGRAM_LOOKUP_ATTEMPTS', '3'))
+# Rest after a throttle doubles per consecutive throttle, up to the maximum
+THROTTLE_BASE_SECONDS = 60.0
+THROTTLE_MAX_SECONDS = 3600.0
+# A logged-in session that is logged out or forbidden is left alone for longer
+LOGIN_FAILURE_SECONDS = 3600.0
+SESSION_SAVE_INTERVAL = 300.0
+WINDOW_SECONDS = 3600.0
+
+class InstagramUnavailable(Exception):
+    """Raised when no Instagram session can take a lookup in time."""
+
+def _is_throttle(error: Exception) -> bool:
+    if isinstance(error, TooManyRequestsException):
+        return True
+    message = str(error).lower()
+    # With one connection attempt Instaloader reports a 429 as a ConnectionException
+    return isinstance(error, ConnectionException) and ('429' in message or 'wait a few minutes' in message)
+
+def _is_login_failure(error: Exception) -> bool:
+    if isinstance(error, (LoginRequiredException, QueryReturnedForbiddenException)):
+        return True
+    return isinstance(error, ConnectionException) and '401' in str(error)
+
+class InstagramSession:
+    """One Instaloader with its cookies, hourly budget and rest period."""
+
+    def __init__(self, loader: Instaloader, username: Optional[str] = None, session_file: Optional[Path] = None):
+        self.loader = loader
+        self.username = username
+        self.session_file = session_file
+        self.busy = False
+        self.rest_until = 0.0
+        self.throttles = 0
+        self.lookups = 0
+        self.last_used = 0.0
+        self.last_saved = time.time()
+        self._recent = deque()  # Lookup times in the last WINDOW_SECONDS
+
+    @property
+    def name(self) -> str:
+        return self.username or 'anonymous'
+
+    def available_at(self, now: float, lookups_per_hour: int) -> float:
+        """When this session may take its next lookup (now or earlier means immediately)."""
+        while self._recent and self._recent[0] <= now - WINDOW_SECONDS:
+            self._recent.popleft()
+        ready = self.rest_until
+        if len(self._recent) >= lookups_per_hour:
+            ready = max(ready, self._recent[0] + WINDOW_SECONDS)
+        return ready
+
+    def record_lookup(self, now: float):
+        self._recent.append(now)
+        self.lookups += 1
+        self.last_used = now
+
+    def save(self):
+        """Writes the session cookies back to its file (logged-in sessions only)."""
+        if self.session_file is None:
+            return
+        try:
+            self.session_file.parent.mkdir(parents=True, exist_ok=True)
+            self.loader.save_session_to_file(str(self.session_file))
+            self.last_saved = time.time()
+        except Exception as e:
+            logger.warning(f"Could not save Instagram session for {self.name}: {e}")
+
+    def stats(self, now: float, lookups_per_hour: int) -> dict:
+        return {
+            'username': self.name,
+            'busy': self.busy,
+            'lookupsLastHour': len(self._recent),
+            'lookupsPerHour': lookups_per_hour,
+            'restingFor': round(max(0.0, self.rest_until - now), 1),
+            'throttles': self.throttles,
+            'lookups': self.lookups
+        }
+
+def _new_loader() -> Instaloader:
+    # Fail fast on errors so the pool can rotate instead of Instaloader retrying on one session
+    return Instaloader(
+        download_pictures=False,
+        download_videos=False,
+        download_video_thumbnails=False,
+        save_metadata=False,
+        quiet=True,
+        max_connection_attempts=1
+    )
+
+def load_sessions(usernames: List[str], session_dir: Path) -> List[InstagramSession]:
+    """Builds a logged-in session per username with a session file; anonymous if there are none."""
+    sessions = []
+    for username in usernames:
+        session_file = session_dir / f"session-{username}"
+        loader = _new_loader()
+        try:
+            if session_file.exists():
+                loader.load_session_from_file(username, str(session_file))
+            else:
+                # Fall back to the file `instaloader --login` writes by default
+                loader.load_session_from_file(username)
+        except (OSError, ValueError) as e:
+            logger.warning(f"No Instagram session for {username} ({e}); "
+                           f"create one with: instaloader --login {username} --sessionfile {session_file}")
+            continue
+        sessions.append(InstagramSession(loader, username, session_file))
+
+    if not sessions:
+        if usernames:
+            logger.warning("No Instagram session could be loaded; using an anonymous session")
+        sessions.append(InstagramSession(_new_loader()))
+    return sessions
+
+class InstagramSessionPool:
+    """Hands out Instagram sessions, one caller per session at a time.
+
+    Logged-in sessions are preferred over anonymous ones, then the least
+    recently used session, so load spreads across accounts.
+    """
+
+    def __init__(
+        self,
+        sessions: List[InstagramSession],
+        lookups_per_hour: int = INSTAGRAM_LOOKUPS_PER_HOUR,
+        acquire_timeout: float = INSTAGRAM_ACQUIRE_TIMEOUT,
+        attempts: int = INSTAGRAM_LOOKUP_ATTEMPTS
+    ):
+        self.sessions = sessions
+        self.lookups_per_hour = lookups_per_hour
+        self.acquire_timeout = acquire_timeout
+        self.attempts = attempts
+        self._condition = threading.Condition()
+        self._waiting = 0
+
+    def _pick(self, now: float) -> Optional[InstagramSession]:
+        """The best free session that may run now (caller holds the condition)."""
+        ready = [session for session in self.sessions
+                 if not session.busy and session.available_at(now, self.lookups_per_hour) <= now]
+        if not ready:
+            return None
+        return min(ready, key=lambda session: (session.username is None, session.last_used))
+
+    def _next_ready_in(self, now: float) -> Optional[float]:
+        """Seconds until a free session leaves its rest or budget limit; None if all are busy."""
+        times = [session.available_at(now, self.lookups_per_hour)
+                 for session in self.sessions if not session.busy]
+        return max(0.0, min(times) - now) if times else None
+
+    def acquire(self, timeout: Optional[float] = None) -> InstagramSession:
+        """Checks out a session, waiting for one to become free or rested."""
+        deadline = time.monotonic() + (self.acquire_timeout if timeout is None else timeout)
+        with self._condition:
+            self._waiting += 1
+            try:
+                while True:
+                    now = time.time()
+                    session = self._pick(now)
+                    if session is not None:
+                        session.busy = True
+                        session.record_lookup(now)
+                        return session
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise InstagramUnavailable("All Instagram sessions are busy or rate limited")
+                    ready_in = self._next_ready_in(now)
+                    self._condition.wait(remaining if ready_in is None else min(remaining, ready_in + 0.01))
+            finally:
+                self._waiting -= 1
+
+    def release(self, session: InstagramSession, error: Optional[Exception] = None):
+        """Returns a session, resting it when the lookup was throttled or refused."""
+        now = time.time()
+        save = False
+        with self._condition:
+            session.busy = False
+            # Without an account there is no session file to refresh; Instagram refusing
+            # anonymous lookups is a throttle and clears up the same way
+            refused = error is not None and _is_login_failure(error)
+            if error is not None and (_is_throttle(error) or (refused and session.username is None)):
+                session.throttles += 1
+                rest = min(THROTTLE_MAX_SECONDS, THROTTLE_BASE_SECONDS * 2 ** (session.throttles - 1))
+                session.rest_until = now + rest
+                logger.warning(f"Instagram session {session.name} throttled, resting {rest:.0f}s")
+            elif refused:
+                session.rest_until = now + LOGIN_FAILURE_SECONDS
+                logger.warning(f"Instagram session {session.name} was refused ({error}); "
+                               f"refresh its session file")
+            elif error is None:
+                session.throttles = 0
+                save = now - session.last_saved >= SESSION_SAVE_INTERVAL
+            self._condition.notify_all()
+        if save:
+            session.save()
+
+    def run(self, fetch: Callable[[Instaloader], T]) -> T:
+        """Runs fetch(loader) on a pooled session, moving to another session when one is throttled."""
+        error = None
+        for _ in range(self.attempts):
+            session = self.acquire()
+            try:
+                result = fetch(session.loader)
+            except Exception as e:
+                self.release(session, e)
+                if not (_is_throttle(e) or _is_login_failure(e)):
+                    raise
+                error = e
+                continue
+            self.release(session)
+            return result
+        raise InstagramUnavailable(f"Instagram lookup failed on {self.attempts} sessions: {error}")
+
+    def save_all(self):
+        """Persists the cookies of every logged-in session."""
+        for session in self.sessions:
+            session.save()
+
+    def stats(self) -> dict:
+        now = time.time()
+        with self._condition:
+            return {
+                'waiting': self._waiting,
+                'sessions': [session.stats(now, self.lookups_per_hour) for session in self.sessions]
+            }
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_instagram_pool() -> InstagramSessionPool:
+    """Returns the process-wide session pool, loading sessions on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            usernames = [name.strip() for name in os.getenv('INSTAGRAM_USERNAMES', '').split(',') if name.strip()]
+            session_dir = Path(os.getenv('INSTAGRAM_SESSION_DIR', str(DEFAULT_SESSION_DIR)))
+            _pool = InstagramSessionPool(load_sessions(usernames, session_dir))
+            atexit.register(_pool.save_all)
+        return _pool
@@ -0,0 +1,191 @@
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', '50'))
+JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', '3600'))
+
+class JobCancelled(Exception):
+    """Raised inside a job when it has been cancelled."""
+
+class QueueFull(Exception):
+    """Raised when the queue already holds the maximum number of pending jobs."""
+
+class Job:
+    """A unit of background work with stage-by-stage progress."""
+
+    FINISHED = ('completed', 'failed', 'cancelled')
+
+    def __init__(self, kind: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = 'queued'
+        self.stage = 'queued'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.events: List[dict] = []
+        self.future = None
+        self._cancel = threading.Event()
+        self._changed = threading.Condition()
+        self._add_event('queued')
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def report(self, stage: str):
+        """Records a progress stage; raises JobCancelled if the job was cancelled."""
+        if self._cancel.is_set():
+            raise JobCancelled()
+        self.stage = stage
+        self._add_event(stage)
+
+    def finish(self, status: str, result=None, error: Optional[str] = None):
+        """Marks the job as finished and wakes up anyone waiting on it."""
+        self.status = status
+        self.stage = status
+        self.result = result
+        self.error = error
+        self.finished_at = time.time()
+        self._add_event(status)
+
+    def wait_for_events(self, since: int, timeout: float) -> List[dict]:
+        """Returns events after index `since`, waiting up to `timeout` seconds for new ones."""
+        with self._changed:
+            if len(self.events) <= since and self.status not in self.FINISHED:
+                self._changed.wait(timeout)
+            return self.events[since:]
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'stage': self.stage,
+            'result': self.result,
+            'error': self.error,
+            'createdAt': self.created_at,
+            'finishedAt': self.finished_at,
+            'events': list(self.events)
+        }
+
+    def _add_event(self, stage: str):
+        with self._changed:
+            self.events.append({'stage': stage, 'time': time.time()})
+            self._changed.notify_all()
+
+class JobQueue:
+    """Bounded worker pool that runs jobs and keeps their results for a while."""
+
+    def __init__(
+        self,
+        max_workers: int = JOB_WORKERS,
+        max_pending: int = JOB_MAX_PENDING,
+        retention_seconds: int = JOB_RETENTION_SECONDS
+    ):
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, func: Callable, *args, **kwargs) -> Job:
+        """Queues func(*args, progress=job.report, **kwargs) and returns its Job.
+
+        The function's return value becomes the job result; a None result marks
+        the job as failed.
+        """
+        with self._lock:
+            self._prune()
+            pending = sum(1 for job in self._jobs.values() if job.status in ('queued', 'running'))
+            if pending >= self.max_pending:
+                raise QueueFull(f"Too many pending jobs ({pending})")
+            job = Job(kind)
+            self._jobs[job.id] = job
+
+        job.future = self._executor.submit(self._run, job, func, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancels a job: queued jobs never start, running jobs stop at their next stage."""
+        job = self.get(job_id)
+        if job is None or job.status in Job.FINISHED:
+            return job
+        job._cancel.set()
+        if job.future is not None and job.future.cancel():
+            job.finish('cancelled')
+        return job
+
+    def events(self, job_id: str, poll_seconds: float = 15.0) -> Iterator[dict]:
+        """Yields progress events for a job until it finishes.
+
+        A None item is yielded whenever poll_seconds pass without news, so
+        callers can send keep-alives.
+        """
+        job = self.get(job_id)
+        if job is None:
+            return
+        seen = 0
+        while True:
+            new_events = job.wait_for_events(seen, poll_seconds)
+            if not new_events:
+                yield None
+                continue
+            for event in new_events:
+                yield event
+            seen += len(new_events)
+            if job.status in Job.FINISHED and seen >= len(job.events):
+                return
+
+    def _run(self, job: Job, func: Callable, args, kwargs):
+        if job.cancelled:
+            job.finish('cancelled')
+            return
+        job.status = 'running'
+        try:
+            job.report('running')
+            result = func(*args, progress=job.report, **kwargs)
+            if job.cancelled:
+                job.finish('cancelled')
+            elif result is None:
+                job.finish('failed', error=f"{job.kind} job produced no result")
+            else:
+                job.finish('completed', result=result)
+        except JobCancelled:
+            job.finish('cancelled')
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            job.finish('failed', error=str(e))
+
+    def _prune(self):
+        """Forgets finished jobs older than the retention window (caller holds the lock)."""
+        cutoff = time.time() - self.retention_seconds
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """Returns the process-wide job queue."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -0,0 +1,266 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Optional
+
+from metrics import record_cache_lookup
+from rate_limiter import acall_openai, call_openai, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path(__file__).parent / 'cache' / 'llm_cache.sqlite3'
+# A disk hit rewrites an entry's last-access time at most this often (seconds)
+ACCESS_UPDATE_SECONDS = 3600
+
+class LLMCache:
+    """Two-level cache for chat completions: an in-memory LRU in front of SQLite.
+
+    Entries are keyed by a hash of (model, messages, temperature, max_tokens)
+    and expire after ttl_seconds. The disk store is trimmed back to
+    max_disk_bytes by evicting the least recently used entries; disk access
+    times are refreshed at most every access_update_seconds.
+    """
+
+    def __init__(
+        self,
+        cache_path: Path = DEFAULT_CACHE_PATH,
+        max_memory_entries: int = 256,
+        max_disk_bytes: int = 50 * 1024 * 1024,
+        ttl_seconds: int = 7 * 24 * 3600,
+        access_update_seconds: float = ACCESS_UPDATE_SECONDS
+    ):
+        self.cache_path = Path(cache_path)
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self.access_update_seconds = access_update_seconds
+
+        self._memory = OrderedDict()  # key -> (created_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        self._db = sqlite3.connect(str(self.cache_path), check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS completions (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON completions (accessed_at)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(model: str, messages: List[dict], temperature: Optional[float] = None,
+                 max_tokens: Optional[int] = None) -> str:
+        """Returns the content hash used as the cache key for a request."""
+        payload = json.dumps(
+            {'model': model, 'messages': messages, 'temperature': temperature, 'max_tokens': max_tokens},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns a cached value, checking memory first and then disk."""
+        value = self._get_memory(key)
+        return value if value is not None else self._get_disk(key)
+
+    async def aget(self, key: str) -> Optional[str]:
+        """Async get(): memory hits return at once, disk lookups run in a worker thread."""
+        value = self._get_memory(key)
+        return value if value is not None else await asyncio.to_thread(self._get_disk, key)
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            created_at, value = entry
+            if now - created_at > self.ttl_seconds:
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            self.hits += 1
+            record_cache_lookup('llm', True)
+            return value
+
+    def _get_disk(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT value, created_at, accessed_at FROM completions WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._db.execute("DELETE FROM completions WHERE key = ?", (key,))
+                    self._db.commit()
+                self.misses += 1
+                record_cache_lookup('llm', False)
+                return None
+
+            value, created_at, accessed_at = row
+            # Eviction order only needs coarse recency, so most hits skip the write
+            if now - accessed_at >= self.access_update_seconds:
+                self._db.execute("UPDATE completions SET accessed_at = ? WHERE key = ?", (now, key))
+                self._db.commit()
+            self._remember(key, created_at, value)
+            self.hits += 1
+            record_cache_lookup('llm', True)
+            return value
+
+    def set(self, key: str, value: str):
+        """Stores a value in memory and on disk, evicting old entries as needed."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            self._db.execute(
+                "INSERT OR REPLACE INTO completions (key, value, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, len(value.encode('utf-8')), now, now)
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """Returns hit/miss counters and current sizes."""
+        with self._lock:
+            disk_entries, disk_bytes = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM completions"
+            ).fetchone()
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'memory_entries': len(self._memory),
+                'disk_entries': disk_entries,
+                'disk_bytes': disk_bytes
+            }
+
+    def _remember(self, key: str, created_at: float, value: str):
+        """Puts an entry in the memory LRU (caller holds the lock)."""
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self, now: float):
+        """Drops expired entries, then the least recently used ones over the size limit."""
+        self._db.execute("DELETE FROM completions WHERE created_at < ?", (now - self.ttl_seconds,))
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM completions").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+
+        stale_keys = []
+        for key, size in self._db.execute("SELECT key, size FROM completions ORDER BY accessed_at"):
+            if total <= self.max_disk_bytes:
+                break
+            stale_keys.append((key,))
+            total -= size
+        self._db.executemany("DELETE FROM completions WHERE key = ?", stale_keys)
+        for (key,) in stale_keys:
+            self._memory.pop(key, None)
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMCache:
+    """Returns the process-wide LLM cache, configured from the environment."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(
+                cache_path=Path(os.getenv('LLM_CACHE_PATH', str(DEFAULT_CACHE_PATH))),
+                max_memory_entries=int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', '256')),
+                max_disk_bytes=int(os.getenv('LLM_CACHE_MAX_BYTES', str(50 * 1024 * 1024))),
+                ttl_seconds=int(os.getenv('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600))),
+                access_update_seconds=float(os.getenv('LLM_CACHE_ACCESS_UPDATE_SECONDS',
+                                                      str(ACCESS_UPDATE_SECONDS)))
+            )
+        return _cache
+
+def cached_chat_completion(
+    client,
+    model: str,
+    messages: List[dict],
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    bypass_cache: bool = False
+) -> Optional[str]:
+    """Runs a chat completion through the cache and returns the message content.
+
+    With bypass_cache the API is always called, and the fresh answer replaces
+    the cached one.
+    """
+    cache = get_llm_cache()
+    key = cache.make_key(model, messages, temperature, max_tokens)
+
+    if not bypass_cache:
+        cached = cache.get(key)
+        if cached is not None:
+            logger.debug(f"LLM cache hit for {model}")
+            return cached
+
+    params = {'messages': messages}
+    if temperature is not None:
+        params['temperature'] = temperature
+    if max_tokens is not None:
+        params['max_tokens'] = max_tokens
+
+    response = call_openai(model, estimate_tokens(messages, max_tokens), client.chat.completions.create, **params)
+    if not response.choices:
+        return None
+
+    content = response.choices[0].message.content
+    if content is not None:
+        cache.set(key, content)
+    return content
+
+async def acached_chat_completion(
+    client,
+    model: str,
+    messages: List[dict],
+    temperature: Optional[float] = None,
+    max_tokens: Optional[int] = None,
+    bypass_cache: bool = False
+) -> Optional[str]:
+    """Async variant of cached_chat_completion for an AsyncOpenAI client."""
+    cache = get_llm_cache()
+    key = cache.make_key(model, messages, temperature, max_tokens)
+
+    # SQLite reads and writes run in worker threads so a slow disk never stalls the loop
+    if not bypass_cache:
+        cached = await cache.aget(key)
+        if cached is not None:
+            logger.debug(f"LLM cache hit for {model}")
+            return cached
+
+    params = {'messages': messages}
+    if temperature is not None:
+        params['temperature'] = temperature
+    if max_tokens is not None:
+        params['max_tokens'] = max_tokens
+
+    response = await acall_openai(
+        model, estimate_tokens(messages, max_tokens), client.chat.completions.create, **params
+    )
+    if not response.choices:
+        return None
+
+    content = response.choices[0].message.content
+    if content is not None:
+        await asyncio.to_thread(cache.set, key, content)
+    return content
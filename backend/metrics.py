@@ -0,0 +1,190 @@
+"""Process-wide timing spans, counters and histograms for the /metrics endpoint.
+
+Pipeline stages are wrapped in span(), which records how long the stage took
+under its stage, platform, model and outcome labels. The platform comes from
+the surrounding platform_context(), so nested work (an LLM call made while
+processing a TikTok) is attributed to the request that caused it. render()
+returns everything in the Prometheus text exposition format.
+"""
+import contextvars
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; downloads and long transcriptions run for minutes
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+_platform = contextvars.ContextVar('metrics_platform', default='none')
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    """A monotonically increasing value per label combination."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def collect(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label combination."""
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str], buckets: Sequence[float]):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: Dict[Tuple[str, ...], list] = {}  # key -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            snapshot = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+STAGE_SECONDS = Histogram(
+    'pipeline_stage_seconds',
+    'Time spent in each pipeline stage.',
+    ('stage', 'platform', 'model', 'outcome'),
+    STAGE_BUCKETS
+)
+OPENAI_TOKENS = Counter(
+    'openai_tokens_total',
+    'Tokens reported by the OpenAI API, by kind (prompt or completion).',
+    ('model', 'platform', 'kind')
+)
+OPENAI_CALL_TOKENS = Histogram(
+    'openai_call_tokens',
+    'Total tokens used per OpenAI call.',
+    ('model', 'platform'),
+    TOKEN_BUCKETS
+)
+CACHE_LOOKUPS = Counter(
+    'cache_lookups_total',
+    'Cache lookups by cache and result (hit or miss).',
+    ('cache', 'result')
+)
+
+_metrics = [STAGE_SECONDS, OPENAI_TOKENS, OPENAI_CALL_TOKENS, CACHE_LOOKUPS]
+
+def current_platform() -> str:
+    return _platform.get()
+
+@contextmanager
+def platform_context(platform: str):
+    """Attributes spans and token usage inside the block to platform."""
+    token = _platform.set(platform)
+    try:
+        yield
+    finally:
+        _platform.reset(token)
+
+@contextmanager
+def span(stage: str, model: str = '', platform: Optional[str] = None):
+    """Times the block as one run of stage; exceptions are recorded as outcome="error"."""
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        STAGE_SECONDS.observe(
+            time.perf_counter() - started,
+            stage=stage,
+            platform=platform or current_platform(),
+            model=model,
+            outcome=outcome
+        )
+
+def record_token_usage(model: str, usage):
+    """Counts the prompt/completion tokens of one API response (usage may be None)."""
+    if usage is None:
+        return
+    platform = current_platform()
+    prompt_tokens = getattr(usage, 'prompt_tokens', None) or 0
+    completion_tokens = getattr(usage, 'completion_tokens', None) or 0
+    total_tokens = getattr(usage, 'total_tokens', None) or prompt_tokens + completion_tokens
+    OPENAI_TOKENS.inc(prompt_tokens, model=model, platform=platform, kind='prompt')
+    OPENAI_TOKENS.inc(completion_tokens, model=model, platform=platform, kind='completion')
+    OPENAI_CALL_TOKENS.observe(total_tokens, model=model, platform=platform)
+
+def record_cache_lookup(cache: str, hit: bool):
+    CACHE_LOOKUPS.inc(cache=cache, result='hit' if hit else 'miss')
+
+def _cache_hit_ratio() -> List[str]:
+    """Hit ratio per cache since start, derived from cache_lookups_total."""
+    lookups: Dict[str, Dict[str, float]] = {}
+    for (cache, result), value in CACHE_LOOKUPS.values().items():
+        lookups.setdefault(cache, {})[result] = value
+    lines = ["# HELP cache_hit_ratio Share of cache lookups that were hits since the process started.",
+             "# TYPE cache_hit_ratio gauge"]
+    for cache, counts in sorted(lookups.items()):
+        total = counts.get('hit', 0) + counts.get('miss', 0)
+        ratio = counts.get('hit', 0) / total if total else 0.0
+        lines.append(f'cache_hit_ratio{{cache="{_escape(cache)}"}} {round(ratio, 4)}')
+    return lines
+
+def render() -> str:
+    """Returns all metrics in the Prometheus text format."""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.collect())
+    lines.extend(_cache_hit_ratio())
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,54 @@
+import os
+import threading
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+# Connection pool and timeout settings for the shared client
+OPENAI_MAX_CONNECTIONS = int(os.getenv('OPENAI_MAX_CONNECTIONS', '20'))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('OPENAI_MAX_KEEPALIVE_CONNECTIONS', '10'))
+OPENAI_KEEPALIVE_EXPIRY = float(os.getenv('OPENAI_KEEPALIVE_EXPIRY', '60'))
+OPENAI_CONNECT_TIMEOUT = float(os.getenv('OPENAI_CONNECT_TIMEOUT', '10'))
+OPENAI_READ_TIMEOUT = float(os.getenv('OPENAI_READ_TIMEOUT', '600'))
+# Retries are scheduled by rate_limiter so they respect the shared buckets
+OPENAI_MAX_RETRIES = int(os.getenv('OPENAI_MAX_RETRIES', '0'))
+
+_client = None
+_async_client = None
+_client_lock = threading.Lock()
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=OPENAI_MAX_CONNECTIONS,
+        max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=OPENAI_KEEPALIVE_EXPIRY
+    )
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT)
+
+def get_openai_client() -> OpenAI:
+    """Returns the process-wide OpenAI client.
+
+    The client wraps one pooled, keep-alive httpx.Client, so TLS connections are
+    reused across requests and threads instead of being opened per call.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            http_client = httpx.Client(limits=_limits(), timeout=_timeout())
+            _client = OpenAI(http_client=http_client, max_retries=OPENAI_MAX_RETRIES)
+        return _client
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """Returns the process-wide AsyncOpenAI client.
+
+    Its connection pool belongs to the background event loop, so it must only
+    be awaited from coroutines running there (see event_loop.get_background_loop).
+    """
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            http_client = httpx.AsyncClient(limits=_limits(), timeout=_timeout())
+            _async_client = AsyncOpenAI(http_client=http_client, max_retries=OPENAI_MAX_RETRIES)
+        return _async_client
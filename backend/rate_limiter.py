@@ -0,0 +1,320 @@
+"""Admission control for OpenAI calls: per-model request and token buckets plus retries.
+
+Every GPT-4, vision and Whisper call goes through call_openai/acall_openai.
+Each call reserves one request and its estimated tokens from its model's
+buckets and waits its turn, so bursts from several users queue up at the
+limit instead of turning into 429s. Calls that still get throttled back off
+using the delay from the response headers and pause their model for everyone.
+"""
+import asyncio
+import logging
+import os
+import random
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+import openai
+
+from concurrency_limits import async_limit, limit
+from metrics import record_token_usage, span
+from token_counter import count_tokens
+
+logger = logging.getLogger(__name__)
+
+def _model_limits(model: str, rpm: int, tpm: int):
+    """(requests per minute, tokens per minute) for a model, overridable from the environment.
+
+    gpt-4o-mini reads OPENAI_RPM_GPT_4O_MINI / OPENAI_TPM_GPT_4O_MINI; 0 tokens means no token limit.
+    """
+    suffix = re.sub(r'\W', '_', model).upper()
+    return int(os.getenv(f'OPENAI_RPM_{suffix}', rpm)), int(os.getenv(f'OPENAI_TPM_{suffix}', tpm))
+
+MODEL_LIMITS = {
+    'gpt-4': _model_limits('gpt-4', 500, 10000),
+    'gpt-4o-mini': _model_limits('gpt-4o-mini', 500, 200000),
+    'whisper-1': _model_limits('whisper-1', 50, 0),
+}
+DEFAULT_LIMITS = (int(os.getenv('OPENAI_RPM', '500')), int(os.getenv('OPENAI_TPM', '30000')))
+
+# Buckets hold this many seconds' worth of allowance; a full minute matches how OpenAI
+# meters RPM/TPM, so a large prompt near the TPM limit can still be admitted
+RATE_LIMIT_BURST_SECONDS = float(os.getenv('RATE_LIMIT_BURST_SECONDS', '60'))
+OPENAI_CALL_ATTEMPTS = int(os.getenv('OPENAI_CALL_ATTEMPTS', '5'))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 60.0
+# Counted against the token budget when a call sets no max_tokens
+DEFAULT_COMPLETION_TOKENS = 512
+# A high-detail image costs up to ~765 tokens (four 512px tiles plus the base)
+IMAGE_TOKENS = 765
+
+DURATION_PATTERN = re.compile(r'(\d+(?:\.\d+)?)(ms|s|m|h)')
+DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+class TokenBucket:
+    """Refills continuously at rate per second up to capacity.
+
+    reserve() always succeeds and may drive the level negative; the returned
+    delay is how long the caller must wait for its reservation to be covered,
+    which serves callers in arrival order.
+    """
+
+    def __init__(self, per_minute: int):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * RATE_LIMIT_BURST_SECONDS)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        self._refill(now)
+        self.level -= amount
+        return -self.level / self.rate if self.level < 0 else 0.0
+
+    def refund(self, amount: float, now: float):
+        self._refill(now)
+        self.level = min(self.capacity, self.level + amount)
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        return self.level
+
+class ModelBudget:
+    """Request and token buckets for one model, plus what is queued on them."""
+
+    def __init__(self, rpm: int, tpm: int):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.paused_until = 0.0
+        self.waiting = 0
+        self.in_flight = 0
+        self.throttled = 0
+        self.retries = 0
+
+class RateLimiter:
+    """Per-model admission scheduler shared by every OpenAI call in the process."""
+
+    def __init__(self):
+        self._budgets: Dict[str, ModelBudget] = {}
+        self._lock = threading.Lock()
+
+    def _budget(self, model: str) -> ModelBudget:
+        budget = self._budgets.get(model)
+        if budget is None:
+            budget = ModelBudget(*MODEL_LIMITS.get(model, DEFAULT_LIMITS))
+            self._budgets[model] = budget
+        return budget
+
+    def reserve(self, model: str, tokens: int) -> float:
+        """Books one request and its tokens; returns how long to wait before sending it."""
+        with self._lock:
+            now = time.monotonic()
+            budget = self._budget(model)
+            delay = budget.requests.reserve(1, now)
+            if budget.tokens is not None:
+                delay = max(delay, budget.tokens.reserve(tokens, now))
+            delay = max(delay, budget.paused_until - now)
+            budget.waiting += 1
+            return delay
+
+    def _admitted(self, model: str):
+        with self._lock:
+            budget = self._budget(model)
+            budget.waiting -= 1
+            budget.in_flight += 1
+
+    def release(self, model: str):
+        """Marks an admitted call as finished."""
+        with self._lock:
+            self._budget(model).in_flight -= 1
+
+    def admit(self, model: str, tokens: int):
+        """Blocks until the call may be sent."""
+        delay = self.reserve(model, tokens)
+        try:
+            if delay > 0:
+                time.sleep(delay)
+        finally:
+            self._admitted(model)
+
+    async def aadmit(self, model: str, tokens: int):
+        """Async admit(): waits on the event loop instead of blocking a thread."""
+        delay = self.reserve(model, tokens)
+        try:
+            if delay > 0:
+                await asyncio.sleep(delay)
+        finally:
+            self._admitted(model)
+
+    def settle(self, model: str, estimated: int, actual: Optional[int]):
+        """Corrects the token bucket once the real usage is known."""
+        if actual is None:
+            return
+        with self._lock:
+            budget = self._budget(model)
+            if budget.tokens is None:
+                return
+            now = time.monotonic()
+            if actual < estimated:
+                budget.tokens.refund(estimated - actual, now)
+            else:
+                budget.tokens.reserve(actual - estimated, now)
+
+    def throttled(self, model: str, pause: float):
+        """Records a 429 and holds back every queued call for the model for pause seconds."""
+        with self._lock:
+            budget = self._budget(model)
+            budget.throttled += 1
+            budget.retries += 1
+            budget.paused_until = max(budget.paused_until, time.monotonic() + pause)
+
+    def retried(self, model: str):
+        with self._lock:
+            self._budget(model).retries += 1
+
+    def queue_depth(self) -> int:
+        """Number of calls waiting for admission across all models."""
+        with self._lock:
+            return sum(budget.waiting for budget in self._budgets.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            return {
+                model: {
+                    'rpm': budget.rpm,
+                    'tpm': budget.tpm,
+                    'waiting': budget.waiting,
+                    'inFlight': budget.in_flight,
+                    'throttled': budget.throttled,
+                    'retries': budget.retries,
+                    'requestsAvailable': round(budget.requests.available(now), 2),
+                    'tokensAvailable': round(budget.tokens.available(now)) if budget.tokens else None,
+                    'pausedFor': round(max(0.0, budget.paused_until - now), 2)
+                }
+                for model, budget in self._budgets.items()
+            }
+
+_limiter = RateLimiter()
+
+def get_rate_limiter() -> RateLimiter:
+    return _limiter
+
+def estimate_tokens(messages: List[dict], max_tokens: Optional[int] = None) -> int:
+    """Estimates what a chat call counts against the TPM limit: prompt plus completion budget."""
+    tokens = 0
+    for message in messages:
+        tokens += 4  # Per-message framing
+        content = message.get('content')
+        if isinstance(content, str):
+            tokens += count_tokens(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get('type') == 'text':
+                    tokens += count_tokens(part.get('text', ''))
+                elif part.get('type') == 'image_url':
+                    tokens += IMAGE_TOKENS
+    return tokens + (max_tokens or DEFAULT_COMPLETION_TOKENS)
+
+def _header_delay(error: Exception) -> Optional[float]:
+    """Reads the server's suggested wait from retry-after or the x-ratelimit-reset headers."""
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    headers = response.headers
+
+    if headers.get('retry-after-ms'):
+        try:
+            return float(headers['retry-after-ms']) / 1000
+        except ValueError:
+            pass
+    if headers.get('retry-after'):
+        try:
+            return float(headers['retry-after'])
+        except ValueError:
+            pass
+
+    resets = []
+    for name in ('x-ratelimit-reset-requests', 'x-ratelimit-reset-tokens'):
+        value = headers.get(name)
+        if value:
+            # e.g. "20ms", "1.5s", "6m0s"
+            resets.append(sum(float(amount) * DURATION_UNITS[unit]
+                              for amount, unit in DURATION_PATTERN.findall(value)))
+    return max(resets) if resets else None
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, openai.RateLimitError):
+        # An exhausted quota will not recover by waiting
+        return getattr(error, 'code', None) != 'insufficient_quota'
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code >= 500
+    return isinstance(error, openai.APIConnectionError)
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """Server-suggested delay plus jitter, or full-jitter exponential backoff without one."""
+    suggested = _header_delay(error)
+    if suggested is not None:
+        return min(BACKOFF_MAX_SECONDS, suggested * random.uniform(1.0, 1.25))
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+def _usage_tokens(response) -> Optional[int]:
+    usage = getattr(response, 'usage', None)
+    return getattr(usage, 'total_tokens', None)
+
+def _handle_failure(limiter: RateLimiter, model: str, error: Exception, attempt: int) -> float:
+    """Re-raises errors that should not be retried; otherwise returns how long to back off."""
+    if not _is_retryable(error) or attempt == OPENAI_CALL_ATTEMPTS - 1:
+        raise error
+    delay = _retry_delay(error, attempt)
+    logger.warning(f"{model} call failed ({error.__class__.__name__}), retrying in {delay:.1f}s")
+    if isinstance(error, openai.RateLimitError):
+        # The pause makes the next admission wait, for this caller and everyone queued behind it
+        limiter.throttled(model, delay)
+        return 0.0
+    limiter.retried(model)
+    return delay
+
+def call_openai(model: str, estimated_tokens: int, create, **params):
+    """Sends create(model=model, **params) once admitted, retrying throttled and transient failures."""
+    limiter = get_rate_limiter()
+    for attempt in range(OPENAI_CALL_ATTEMPTS):
+        limiter.admit(model, estimated_tokens)
+        try:
+            with limit('openai'), span('llm', model=model):
+                response = create(model=model, **params)
+        except Exception as e:
+            limiter.release(model)
+            # The next attempt books its own tokens; give back this attempt's reservation
+            limiter.settle(model, estimated_tokens, 0)
+            time.sleep(_handle_failure(limiter, model, e, attempt))
+            continue
+        limiter.release(model)
+        limiter.settle(model, estimated_tokens, _usage_tokens(response))
+        record_token_usage(model, getattr(response, 'usage', None))
+        return response
+
+async def acall_openai(model: str, estimated_tokens: int, create, **params):
+    """Async call_openai() for AsyncOpenAI methods."""
+    limiter = get_rate_limiter()
+    for attempt in range(OPENAI_CALL_ATTEMPTS):
+        await limiter.aadmit(model, estimated_tokens)
+        try:
+            async with async_limit('openai'):
+                with span('llm', model=model):
+                    response = await create(model=model, **params)
+        except Exception as e:
+            limiter.release(model)
+            limiter.settle(model, estimated_tokens, 0)
+            await asyncio.sleep(_handle_failure(limiter, model, e, attempt))
+            continue
+        limiter.release(model)
+        limiter.settle(model, estimated_tokens, _usage_tokens(response))
+        record_token_usage(model, getattr(response, 'usage', None))
+        return response
@@ -0,0 +1,261 @@
+"""Write-behind journal for /api/schedule.
+
+Scheduled tweets are appended to a local SQLite journal and the request
+returns at once. A background flusher moves everything pending into the
+schedule store in one transaction, then mirrors the changed days to Google
+Sheets in one batched write, retrying failures with backoff. It picks up where
+it left off after a restart; replayed entries are ignored by the store.
+"""
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+from schedule_store import ScheduleStore, SheetsMirror, get_schedule_store, get_sheets_mirror
+from slot_planner import CapacityPolicy
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOURNAL_PATH = Path(__file__).parent / 'cache' / 'schedule_journal.sqlite3'
+# Wait after a new append so bursts of requests go out as one write
+SCHEDULE_FLUSH_DELAY = float(os.getenv('SCHEDULE_FLUSH_DELAY', '2'))
+SCHEDULE_FLUSH_INTERVAL = float(os.getenv('SCHEDULE_FLUSH_INTERVAL', '10'))
+SCHEDULE_FLUSH_MAX_ENTRIES = int(os.getenv('SCHEDULE_FLUSH_MAX_ENTRIES', '2500'))
+SCHEDULE_MAX_ATTEMPTS = int(os.getenv('SCHEDULE_MAX_ATTEMPTS', '8'))
+SCHEDULE_RETENTION_SECONDS = int(os.getenv('SCHEDULE_RETENTION_SECONDS', str(7 * 24 * 3600)))
+RETRY_BASE_SECONDS = 5.0
+RETRY_MAX_SECONDS = 300.0
+# Only the process holding this lease flushes, so a second worker or the
+# Flask reloader never writes the same entries twice
+LEASE_SECONDS = 120.0
+
+class ScheduleJournal:
+    """Durable queue of tweets waiting to be scheduled and written to Google Sheets."""
+
+    def __init__(self, journal_path: Path, store: ScheduleStore, mirror: SheetsMirror):
+        self.journal_path = Path(journal_path)
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self.store = store
+        self.mirror = mirror
+        self.owner = uuid.uuid4().hex
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._failures = 0
+        self._next_attempt = 0.0
+        self.last_flush_at = None
+        self.last_sync_at = None
+        self.last_error = None
+
+        self._db = sqlite3.connect(str(self.journal_path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=FULL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                batch_id TEXT NOT NULL,
+                tweet TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                flushed_at REAL
+            )"""
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(entries)")}
+        if 'policy' not in columns:
+            # Capacity policy (JSON) the batch was submitted with; NULL means the default
+            self._db.execute("ALTER TABLE entries ADD COLUMN policy TEXT")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_entries_status ON entries (status, id)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_entries_batch ON entries (batch_id)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS leases (name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def append(self, tweets: List[str], policy: Optional[CapacityPolicy] = None) -> str:
+        """Durably records tweets for scheduling and returns their batch id."""
+        batch_id = uuid.uuid4().hex
+        now = time.time()
+        policy_json = json.dumps(policy.to_dict()) if policy else None
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO entries (batch_id, tweet, created_at, policy) VALUES (?, ?, ?, ?)",
+                [(batch_id, tweet, now, policy_json) for tweet in tweets]
+            )
+            self._db.commit()
+        self._wake.set()
+        return batch_id
+
+    def start(self):
+        """Starts the background flusher (once)."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='schedule-flusher', daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._wake.wait(SCHEDULE_FLUSH_INTERVAL):
+                # Give concurrent requests a moment to land in the same write
+                self._stop.wait(SCHEDULE_FLUSH_DELAY)
+            self._wake.clear()
+            if self._stop.is_set() or time.time() < self._next_attempt:
+                continue
+            try:
+                if self._acquire_lease():
+                    self.flush()
+                    if time.time() >= self._next_attempt and self.store.dirty_count():
+                        self.sync()
+            except Exception as e:
+                logger.error(f"Schedule flusher error: {e}")
+
+    def _acquire_lease(self) -> bool:
+        """Takes or renews the flusher lease; False if another process holds it."""
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO leases (name, owner, expires_at) VALUES ('flusher', ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                "WHERE leases.owner = excluded.owner OR leases.expires_at < ?",
+                (self.owner, now + LEASE_SECONDS, now)
+            )
+            self._db.commit()
+            row = self._db.execute("SELECT owner FROM leases WHERE name = 'flusher'").fetchone()
+        return row is not None and row[0] == self.owner
+
+    def flush(self) -> int:
+        """Moves all pending entries into the schedule store; returns how many were flushed."""
+        with self._lock:
+            entries = self._db.execute(
+                "SELECT id, batch_id, tweet, policy FROM entries WHERE status = 'pending' ORDER BY id LIMIT ?",
+                (SCHEDULE_FLUSH_MAX_ENTRIES,)
+            ).fetchall()
+        if not entries:
+            return 0
+
+        ids = [entry[0] for entry in entries]
+        try:
+            # A new store must learn where the sheet ends before it assigns slots
+            self.mirror.bootstrap()
+            # Consecutive entries with the same policy are planned together, in order
+            runs = []
+            for entry_id, batch_id, tweet, policy in entries:
+                if not runs or runs[-1][0] != policy:
+                    runs.append((policy, [], []))
+                runs[-1][1].append(tweet)
+                runs[-1][2].append(f"{batch_id}:{entry_id}")
+            for policy, tweets, source_ids in runs:
+                self.store.add_tweets(
+                    tweets,
+                    source_ids=source_ids,
+                    policy=CapacityPolicy.from_dict(json.loads(policy)) if policy else None
+                )
+        except Exception as e:
+            logger.error(f"Scheduling {len(ids)} journaled tweets failed: {e}")
+            self._record_failure(ids, str(e))
+            return 0
+
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "UPDATE entries SET status = 'flushed', flushed_at = ? WHERE id = ?",
+                [(now, entry_id) for entry_id in ids]
+            )
+            self._db.execute(
+                "DELETE FROM entries WHERE status = 'flushed' AND flushed_at < ?",
+                (now - SCHEDULE_RETENTION_SECONDS,)
+            )
+            self._db.commit()
+
+        self.last_flush_at = now
+        if len(entries) == SCHEDULE_FLUSH_MAX_ENTRIES:
+            self._wake.set()  # More are waiting behind this batch
+        logger.info(f"Scheduled {len(ids)} journaled tweets")
+        return len(ids)
+
+    def sync(self) -> bool:
+        """Mirrors changed days to Google Sheets, backing off when the write fails."""
+        try:
+            self.mirror.sync()
+        except Exception as e:
+            logger.error(f"Mirroring the schedule to Google Sheets failed: {e}")
+            self._back_off(str(e))
+            return False
+        self._failures = 0
+        self._next_attempt = 0.0
+        self.last_sync_at = time.time()
+        self.last_error = None
+        return True
+
+    def _record_failure(self, ids: List[int], error: str):
+        """Counts an attempt on each entry and backs the flusher off."""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE entries SET attempts = attempts + 1, last_error = ?, "
+                "status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END WHERE id = ?",
+                [(error, SCHEDULE_MAX_ATTEMPTS, entry_id) for entry_id in ids]
+            )
+            self._db.commit()
+        self._back_off(error)
+
+    def _back_off(self, error: str):
+        self.last_error = error
+        self._failures += 1
+        delay = min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (self._failures - 1))
+        self._next_attempt = time.time() + random.uniform(delay / 2, delay)
+
+    def status(self, batch_id: Optional[str] = None) -> dict:
+        """Counts entries by status, for the whole journal or one batch."""
+        where, params = ("WHERE batch_id = ?", (batch_id,)) if batch_id else ("", ())
+        with self._lock:
+            counts = dict(self._db.execute(
+                f"SELECT status, COUNT(*) FROM entries {where} GROUP BY status", params
+            ).fetchall())
+            oldest = self._db.execute(
+                "SELECT MIN(created_at) FROM entries WHERE status = 'pending'"
+            ).fetchone()[0]
+
+        now = time.time()
+        return {
+            'batchId': batch_id,
+            'pending': counts.get('pending', 0),
+            'flushed': counts.get('flushed', 0),
+            'failed': counts.get('failed', 0),
+            'oldestPendingAge': round(now - oldest, 1) if oldest and not batch_id else None,
+            'unsyncedDays': self.store.dirty_count(),
+            'lastFlushAt': self.last_flush_at,
+            'lastSyncAt': self.last_sync_at,
+            'lastError': self.last_error,
+            'nextAttemptIn': round(max(0.0, self._next_attempt - now), 1)
+        }
+
+_journal = None
+_journal_lock = threading.Lock()
+
+def get_schedule_journal() -> ScheduleJournal:
+    """Returns the process-wide journal, starting its flusher on first use."""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = ScheduleJournal(
+                Path(os.getenv('SCHEDULE_JOURNAL_PATH', str(DEFAULT_JOURNAL_PATH))),
+                get_schedule_store(),
+                get_sheets_mirror()
+            )
+            _journal.start()
+        return _journal
@@ -0,0 +1,373 @@
+"""Local record of the posting schedule, mirrored to the Sheet1 layout Make.com reads.
+
+ScheduleStore keeps one row per (date, slot) in SQLite. Its primary key is a
+B-tree, so the next free slot and date-range queries are index lookups
+instead of sheet scans. SheetsMirror pushes the days that changed to Google
+Sheets, one full row per day, in a single batched write.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import date as Date, datetime
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+from metrics import span
+from slot_planner import MAX_SLOTS_PER_DAY, CapacityPolicy, SlotPlan, default_policy, plan_slots
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = Path(__file__).parent / 'cache' / 'schedule.sqlite3'
+SLOTS_PER_DAY = MAX_SLOTS_PER_DAY
+# Each slot is (Type, Content, Characters, Image, Video) starting at column C
+SLOT_COLUMNS = 5
+FIRST_DATA_ROW = 2
+SHEET_DATE_FORMAT = "%d/%m/%Y"
+
+def _column_letter(index: int) -> str:
+    """0-based column index to its A1 letter(s)."""
+    letters = ''
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+class ScheduleStore:
+    """SQLite-backed schedule: tweets by date and slot, plus the sheet row of each date."""
+
+    def __init__(self, store_path: Path = DEFAULT_STORE_PATH):
+        self.store_path = Path(store_path)
+        self.store_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+        self._db = sqlite3.connect(str(self.store_path), check_same_thread=False, timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS days (
+                date TEXT PRIMARY KEY,
+                day TEXT NOT NULL,
+                sheet_row INTEGER NOT NULL UNIQUE,
+                dirty_at REAL
+            )"""
+        )
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS slots (
+                date TEXT NOT NULL,
+                slot INTEGER NOT NULL,
+                type TEXT NOT NULL DEFAULT 'Text',
+                content TEXT NOT NULL,
+                image TEXT NOT NULL DEFAULT '',
+                video TEXT NOT NULL DEFAULT '',
+                status TEXT NOT NULL DEFAULT 'scheduled',
+                source_id TEXT UNIQUE,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (date, slot)
+            )"""
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_days_dirty ON days (dirty_at) WHERE dirty_at IS NOT NULL")
+        self._db.execute("CREATE INDEX IF NOT EXISTS idx_slots_status ON slots (status, date)")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.commit()
+
+    def is_empty(self) -> bool:
+        with self._lock:
+            return self._db.execute("SELECT 1 FROM days LIMIT 1").fetchone() is None
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self._db.commit()
+
+    def _last_slot(self) -> Optional[Tuple[Date, int]]:
+        """The latest filled (date, slot): one step down the primary key index (caller holds the lock)."""
+        row = self._db.execute("SELECT date, slot FROM slots ORDER BY date DESC, slot DESC LIMIT 1").fetchone()
+        return (Date.fromisoformat(row[0]), row[1]) if row else None
+
+    def next_free_slot(self, default_start: Optional[Date] = None,
+                       policy: Optional[CapacityPolicy] = None) -> Tuple[Date, int]:
+        """The slot after the last scheduled one, or the first usable slot from default_start (today)."""
+        with self._lock:
+            last = self._last_slot()
+        return plan_slots(1, last, policy or default_policy(), default_start).assignments[0]
+
+    def add_tweets(
+        self,
+        tweets: List[str],
+        source_ids: Optional[List[str]] = None,
+        default_start: Optional[Date] = None,
+        policy: Optional[CapacityPolicy] = None,
+        dry_run: bool = False
+    ) -> 'StoredPlan':
+        """Plans tweets into the next free slots under policy and stores them (unless dry_run).
+
+        Tweets whose source id is already stored are skipped, so replaying the
+        same journal entries is harmless. The whole batch is planned at once and
+        written with one executemany per table.
+        """
+        policy = policy or default_policy()
+        now = time.time()
+        with self._lock:
+            if source_ids is not None:
+                known = self._known_source_ids(source_ids)
+                kept = [(tweet, source_id) for tweet, source_id in zip(tweets, source_ids) if source_id not in known]
+                tweets = [tweet for tweet, _ in kept]
+                source_ids = [source_id for _, source_id in kept]
+            else:
+                source_ids = [None] * len(tweets)
+
+            plan = plan_slots(len(tweets), self._last_slot(), policy, default_start)
+            rows, new_days = self._sheet_rows(plan.days)
+            stored = StoredPlan(plan, rows, tweets)
+            if dry_run or not tweets:
+                return stored
+
+            self._db.executemany(
+                "INSERT INTO days (date, day, sheet_row, dirty_at) VALUES (?, ?, ?, ?)",
+                [(day.isoformat(), day.strftime("%A"), rows[day], now) for day in plan.days if day in new_days]
+            )
+            self._db.executemany(
+                "UPDATE days SET dirty_at = ? WHERE date = ?",
+                [(now, day.isoformat()) for day in plan.days if day not in new_days]
+            )
+            self._db.executemany(
+                "INSERT INTO slots (date, slot, content, source_id, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [(day.isoformat(), slot, tweet, source_id, now)
+                 for (day, slot), tweet, source_id in zip(plan.assignments, tweets, source_ids)]
+            )
+            self._db.commit()
+        return stored
+
+    def _known_source_ids(self, source_ids: List[str]) -> set:
+        """Source ids already in the store (caller holds the lock)."""
+        known = set()
+        for start in range(0, len(source_ids), 500):  # Stay under SQLite's bound-parameter limit
+            chunk = source_ids[start:start + 500]
+            known.update(row[0] for row in self._db.execute(
+                f"SELECT source_id FROM slots WHERE source_id IN ({','.join('?' * len(chunk))})", chunk
+            ))
+        return known
+
+    def _sheet_rows(self, days: List[Date]) -> Tuple[dict, set]:
+        """Sheet row of each planned day: existing days keep theirs, new ones follow the last row.
+
+        Returns ({day: row}, new days). Caller holds the lock.
+        """
+        if not days:
+            return {}, set()
+        rows = {
+            Date.fromisoformat(day): sheet_row for day, sheet_row in self._db.execute(
+                "SELECT date, sheet_row FROM days WHERE date BETWEEN ? AND ?",
+                (days[0].isoformat(), days[-1].isoformat())
+            )
+        }
+        last_row = self._db.execute("SELECT MAX(sheet_row) FROM days").fetchone()[0] or FIRST_DATA_ROW - 1
+        new_days = set()
+        for day in days:
+            if day not in rows:
+                last_row += 1
+                rows[day] = last_row
+                new_days.add(day)
+        return rows, new_days
+
+    def set_status(self, day: Date, slot: int, status: str) -> bool:
+        """Updates one slot's status; returns False if the slot is empty."""
+        now = time.time()
+        with self._lock:
+            updated = self._db.execute(
+                "UPDATE slots SET status = ?, updated_at = ? WHERE date = ? AND slot = ?",
+                (status, now, day.isoformat(), slot)
+            ).rowcount
+            self._db.commit()
+        return bool(updated)
+
+    def between(self, start: Date, end: Date) -> List[dict]:
+        """Scheduled slots from start to end inclusive, in posting order."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT s.date, d.day, s.slot, s.type, s.content, s.image, s.video, s.status "
+                "FROM slots s JOIN days d ON d.date = s.date "
+                "WHERE s.date BETWEEN ? AND ? ORDER BY s.date, s.slot",
+                (start.isoformat(), end.isoformat())
+            ).fetchall()
+        return [
+            {'date': row[0], 'day': row[1], 'slot': row[2], 'type': row[3], 'content': row[4],
+             'image': row[5], 'video': row[6], 'status': row[7]}
+            for row in rows
+        ]
+
+    def dirty_days(self, limit: int = 5000) -> List[Tuple[str, str, int, float, List[tuple]]]:
+        """Days changed since their last sync: (date, day, sheet_row, dirty_at, slots)."""
+        with self._lock:
+            days = self._db.execute(
+                "SELECT date, day, sheet_row, dirty_at FROM days WHERE dirty_at IS NOT NULL "
+                "ORDER BY sheet_row LIMIT ?", (limit,)
+            ).fetchall()
+            if not days:
+                return []
+            slots = {}
+            for row in self._db.execute(
+                "SELECT s.date, s.slot, s.type, s.content, s.image, s.video FROM slots s "
+                "JOIN days d ON d.date = s.date WHERE d.dirty_at IS NOT NULL ORDER BY s.date, s.slot"
+            ):
+                slots.setdefault(row[0], []).append(row[1:])
+        return [(date, day, sheet_row, dirty_at, slots.get(date, [])) for date, day, sheet_row, dirty_at in days]
+
+    def dirty_count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM days WHERE dirty_at IS NOT NULL").fetchone()[0]
+
+    def mark_synced(self, synced: Iterable[Tuple[str, float]]):
+        """Clears the dirty mark of days written to the sheet, unless they changed again since."""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE days SET dirty_at = NULL WHERE date = ? AND dirty_at = ?",
+                [(date, dirty_at) for date, dirty_at in synced]
+            )
+            self._db.commit()
+
+    def import_rows(self, rows: List[List[str]]) -> int:
+        """Loads existing Sheet1 rows (header excluded) as already-synced days; returns slots loaded."""
+        now = time.time()
+        loaded = 0
+        with self._lock:
+            for offset, row in enumerate(rows):
+                try:
+                    day = datetime.strptime(row[0], SHEET_DATE_FORMAT).date()
+                except (IndexError, ValueError):
+                    continue
+                self._db.execute(
+                    "INSERT OR IGNORE INTO days (date, day, sheet_row, dirty_at) VALUES (?, ?, ?, NULL)",
+                    (day.isoformat(), day.strftime("%A"), FIRST_DATA_ROW + offset)
+                )
+                for slot in range(SLOTS_PER_DAY):
+                    base = 2 + slot * SLOT_COLUMNS
+                    cells = (row[base:base + SLOT_COLUMNS] + [''] * SLOT_COLUMNS)[:SLOT_COLUMNS]
+                    if not cells[1]:
+                        continue
+                    self._db.execute(
+                        "INSERT OR IGNORE INTO slots (date, slot, type, content, image, video, updated_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (day.isoformat(), slot, cells[0] or 'Text', cells[1], cells[3], cells[4], now)
+                    )
+                    loaded += 1
+            self._db.commit()
+        return loaded
+
+class StoredPlan:
+    """A SlotPlan with the sheet row of each day, as stored (or as it would be, for a dry run)."""
+
+    def __init__(self, plan: SlotPlan, rows: dict, tweets: List[str]):
+        self.plan = plan
+        self.rows = rows
+        self.tweets = tweets
+
+    @property
+    def assignments(self) -> List[Tuple[Date, int]]:
+        return self.plan.assignments
+
+    def to_dict(self) -> dict:
+        names = {day: (day.isoformat(), day.strftime("%A")) for day in self.plan.days}
+        return {
+            'count': len(self.plan),
+            'days': len(self.plan.days),
+            'slots': [
+                {'date': names[day][0], 'day': names[day][1], 'slot': slot, 'row': self.rows[day],
+                 'column': _column_letter(2 + slot * SLOT_COLUMNS + 1), 'content': tweet}
+                for (day, slot), tweet in zip(self.plan.assignments, self.tweets)
+            ]
+        }
+
+def sheet_row_values(date: str, day: str, sheet_row: int, slots: List[tuple]) -> List[str]:
+    """Builds a full Sheet1 row: Date, Day, then Type/Content/Characters/Image/Video per slot."""
+    values = [datetime.fromisoformat(date).strftime(SHEET_DATE_FORMAT), day]
+    cells = [''] * (SLOTS_PER_DAY * SLOT_COLUMNS)
+    for slot, slot_type, content, image, video in slots:
+        base = slot * SLOT_COLUMNS
+        content_column = _column_letter(2 + base + 1)
+        cells[base:base + SLOT_COLUMNS] = [slot_type, content, f"=LEN({content_column}{sheet_row})", image, video]
+    return values + cells
+
+class SheetsMirror:
+    """Copies changed days from the store to Sheet1, the layout Make.com reads."""
+
+    def __init__(self, store: ScheduleStore, manager_factory: Callable):
+        self.store = store
+        self.manager_factory = manager_factory
+        self._sync_lock = threading.Lock()
+        self.last_sync_at = None
+
+    def bootstrap(self) -> int:
+        """Imports the existing sheet once, so a new store continues where the sheet ends."""
+        if self.store.get_meta('imported') or not self.store.is_empty():
+            return 0
+        sheets_manager = self.manager_factory()
+        with span('sheets_read'):
+            result = sheets_manager.sheet.values().get(
+                spreadsheetId=sheets_manager.spreadsheet_id,
+                range='Sheet1!A:Z'
+            ).execute()
+        loaded = self.store.import_rows(result.get('values', [])[1:])
+        self.store.set_meta('imported', '1')
+        logger.info(f"Imported {loaded} scheduled tweets from Google Sheets")
+        return loaded
+
+    def sync(self) -> List[dict]:
+        """Writes every changed day as one batched update; returns the per-row results.
+
+        Raises when no row could be written, so callers can back off.
+        """
+        with self._sync_lock:
+            dirty = self.store.dirty_days()
+            if not dirty:
+                return []
+
+            sheets_manager = self.manager_factory()
+            rows = [(sheet_row, sheet_row_values(date, day, sheet_row, slots))
+                    for date, day, sheet_row, _, slots in dirty]
+            with span('sheets_write'):
+                sheets_manager.create_header()
+                results = sheets_manager.batch_update_rows(rows)
+
+            self.store.mark_synced(
+                (date, dirty_at)
+                for (date, _, _, dirty_at, _), result in zip(dirty, results) if result['updated']
+            )
+            errors = [result['error'] for result in results if result['error']]
+            if errors and len(errors) == len(results):
+                raise RuntimeError(errors[0])
+            self.last_sync_at = time.time()
+            return results
+
+def _default_manager():
+    from GPT4_make_scheduler import get_sheets_manager
+    from settings import config, credentials_path
+    return get_sheets_manager(str(credentials_path), config.get('google_sheets_id'))
+
+_store = None
+_mirror = None
+_store_lock = threading.Lock()
+
+def get_schedule_store() -> ScheduleStore:
+    """Returns the process-wide schedule store."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = ScheduleStore(Path(os.getenv('SCHEDULE_STORE_PATH', str(DEFAULT_STORE_PATH))))
+        return _store
+
+def get_sheets_mirror() -> SheetsMirror:
+    """Returns the process-wide mirror for the configured spreadsheet."""
+    global _mirror
+    store = get_schedule_store()
+    with _store_lock:
+        if _mirror is None:
+            _mirror = SheetsMirror(store, _default_manager)
+        return _mirror
@@ -0,0 +1,27 @@
+"""Configuration shared by the Flask (app.py) and ASGI (asgi_app.py) entry points."""
+import json
+import logging
+import os
+from pathlib import Path
+
+UPLOAD_FOLDER = Path(__file__).parent / 'uploads'
+UPLOAD_FOLDER.mkdir(exist_ok=True)
+
+# Load configuration (CONFIG_PATH points elsewhere, e.g. for the benchmarks)
+config_path = Path(os.getenv('CONFIG_PATH', str(Path(__file__).parent.parent / 'config.json')))
+with open(config_path) as config_file:
+    config = json.load(config_file)
+
+# Make credentials path relative to the project root
+credentials_path = Path(__file__).parent.parent / config['google_sheets_credentials_file']
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# Client libraries that log every request and connection at DEBUG/INFO
+NOISY_LOGGERS = ['httpx', 'httpcore', 'openai', 'urllib3', 'googleapiclient', 'google_auth_httplib2',
+                 'werkzeug', 'asyncio', 'PIL']
+
+def configure_logging():
+    """Sets the root log level from LOG_LEVEL and keeps client libraries at WARNING."""
+    logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    for name in NOISY_LOGGERS:
+        logging.getLogger(name).setLevel(max(logging.WARNING, logging.getLogger().level))
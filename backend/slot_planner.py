@@ -0,0 +1,106 @@
+"""Bulk slot planning: where each of N tweets goes, computed a day at a time."""
+import os
+from datetime import date as Date, timedelta
+from typing import Iterable, List, Optional, Tuple
+
+# Sheet1 has five Type/Content/Characters/Image/Video blocks per row
+MAX_SLOTS_PER_DAY = 5
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+def _parse_weekday(value) -> int:
+    if isinstance(value, int) and 0 <= value < 7:
+        return value
+    name = str(value).strip().lower()
+    for index, weekday in enumerate(WEEKDAYS):
+        # Accept full names and abbreviations like "sat"
+        if len(name) >= 3 and weekday.startswith(name):
+            return index
+    raise ValueError(f"Unknown weekday: {value}")
+
+class CapacityPolicy:
+    """How many tweets a day takes and which days take none."""
+
+    def __init__(self, slots_per_day: int = MAX_SLOTS_PER_DAY, skip_weekdays: Iterable = (),
+                 blackout_dates: Iterable = ()):
+        if not 1 <= slots_per_day <= MAX_SLOTS_PER_DAY:
+            raise ValueError(f"slots_per_day must be between 1 and {MAX_SLOTS_PER_DAY}")
+        self.slots_per_day = slots_per_day
+        self.skip_weekdays = frozenset(_parse_weekday(day) for day in skip_weekdays)
+        if len(self.skip_weekdays) == 7:
+            raise ValueError("At least one weekday must be schedulable")
+        self.blackout_dates = frozenset(
+            day if isinstance(day, Date) else Date.fromisoformat(str(day)) for day in blackout_dates
+        )
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> 'CapacityPolicy':
+        """Builds a policy from API input ({slotsPerDay, skipWeekdays, blackoutDates}), over the defaults."""
+        data = data or {}
+        default = default_policy()
+        return cls(
+            slots_per_day=int(data.get('slotsPerDay', default.slots_per_day)),
+            skip_weekdays=data.get('skipWeekdays', default.skip_weekdays),
+            blackout_dates=data.get('blackoutDates', default.blackout_dates)
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            'slotsPerDay': self.slots_per_day,
+            'skipWeekdays': [WEEKDAYS[index].capitalize() for index in sorted(self.skip_weekdays)],
+            'blackoutDates': sorted(day.isoformat() for day in self.blackout_dates)
+        }
+
+    def allows(self, day: Date) -> bool:
+        return day.weekday() not in self.skip_weekdays and day not in self.blackout_dates
+
+def default_policy() -> CapacityPolicy:
+    """The policy from SCHEDULE_SLOTS_PER_DAY, SCHEDULE_SKIP_WEEKDAYS and SCHEDULE_BLACKOUT_DATES."""
+    split = lambda value: [item for item in value.split(',') if item.strip()]
+    return CapacityPolicy(
+        slots_per_day=int(os.getenv('SCHEDULE_SLOTS_PER_DAY', str(MAX_SLOTS_PER_DAY))),
+        skip_weekdays=split(os.getenv('SCHEDULE_SKIP_WEEKDAYS', '')),
+        blackout_dates=[item.strip() for item in split(os.getenv('SCHEDULE_BLACKOUT_DATES', ''))]
+    )
+
+class SlotPlan:
+    """The (date, slot) of each planned tweet, plus the distinct days they land on."""
+
+    def __init__(self, assignments: List[Tuple[Date, int]], days: List[Date]):
+        self.assignments = assignments
+        self.days = days
+
+    def __len__(self) -> int:
+        return len(self.assignments)
+
+def plan_slots(
+    count: int,
+    last: Optional[Tuple[Date, int]],
+    policy: CapacityPolicy,
+    default_start: Optional[Date] = None
+) -> SlotPlan:
+    """Plans count tweets after the last filled (date, slot), or from default_start (today).
+
+    Work is per day, not per tweet: each usable day is found once and filled
+    with a run of consecutive slots.
+    """
+    if last is None:
+        day, first_slot = default_start or Date.today(), 0
+    else:
+        day, first_slot = last[0], last[1] + 1
+
+    assignments: List[Tuple[Date, int]] = []
+    days: List[Date] = []
+    one_day = timedelta(days=1)
+    remaining = count
+    while remaining > 0:
+        if first_slot >= policy.slots_per_day or not policy.allows(day):
+            day += one_day
+            first_slot = 0
+            continue
+        take = min(policy.slots_per_day - first_slot, remaining)
+        days.append(day)
+        assignments.extend((day, slot) for slot in range(first_slot, first_slot + take))
+        remaining -= take
+        day += one_day
+        first_slot = 0
+    return SlotPlan(assignments, days)
@@ -1,57 +1,121 @@
-import yt_dlp
 import pyktok
-from openai import OpenAI
-from typing import Optional
+from typing import Callable, Optional
 import re
 import logging
 import asyncio
-from instaloader import Instaloader, Post
+from instaloader import Post
 from urllib.parse import urlparse, parse_qs
 import os
 from pathlib import Path
 import tempfile
+import threading
+from audio_pipeline import download_audio, transcribe_audio
+from concurrency_limits import async_platform_limit
+from event_loop import get_background_loop
+from instagram_sessions import get_instagram_pool
+from llm_cache import acached_chat_completion
+from metrics import platform_context, record_cache_lookup, span
+from transcript_store import TranscriptStore, canonical_media_id
+from openai_clients import get_async_openai_client
 
 logger = logging.getLogger(__name__)
 
+TRANSCRIPTION_FAILED = "Transcription failed"
+
+def _report(progress: Optional[Callable[[str], None]], stage: str):
+    """Forwards a pipeline stage to the progress callback, if there is one."""
+    if progress is not None:
+        progress(stage)
+
 class SocialMediaProcessor:
-    def __init__(self):
-        self.client = OpenAI()
-        self.insta = Instaloader()
+    def __init__(self, client=None):
+        self.client = client or get_async_openai_client()
         # Create transcripts directory if it doesn't exist
         self.transcripts_dir = Path(__file__).parent / 'transcripts'
         self.transcripts_dir.mkdir(exist_ok=True)
+        # Machine-readable transcripts, reused when the same video comes back
+        self.transcript_store = TranscriptStore(self.transcripts_dir / 'store')
         
-    def process_url_sync(self, url: str) -> Optional[str]:
-        """Synchronous wrapper for process_url."""
-        return asyncio.run(self.process_url(url))
+    def process_url_sync(
+        self,
+        url: str,
+        bypass_cache: bool = False,
+        progress: Optional[Callable[[str], None]] = None
+    ) -> Optional[str]:
+        """Synchronous wrapper for process_url; runs it on the shared background loop."""
+        return get_background_loop().run(
+            self.process_url(url, bypass_cache=bypass_cache, progress=progress)
+        )
+
+    async def process_url(
+        self,
+        url: str,
+        bypass_cache: bool = False,
+        progress: Optional[Callable[[str], None]] = None
+    ) -> Optional[str]:
+        """Process URL and return a tweet-worthy summary.
 
-    async def process_url(self, url: str) -> Optional[str]:
-        """Process URL and return a tweet-worthy summary."""
+        progress, if given, is called with the name of each pipeline stage as it starts.
+        """
         try:
             platform = self._detect_platform(url)
+        except Exception as e:
+            logger.error(f"Error processing {url}: {str(e)}")
+            return None
+        with platform_context(platform):
+            return await self._process_platform_url(url, platform, bypass_cache, progress)
+
+    async def _process_platform_url(
+        self,
+        url: str,
+        platform: str,
+        bypass_cache: bool,
+        progress: Optional[Callable[[str], None]]
+    ) -> Optional[str]:
+        try:
             content = None
 
             if platform == 'article':
-                from article_processor import ArticleProcessor
-                processor = ArticleProcessor()
-                return processor.process_url_sync(url)
-            elif platform == 'tiktok':
-                content = await self._process_tiktok(url)
-            elif platform == 'instagram':
-                content = await self._process_instagram(url)
-            elif platform == 'youtube':
-                content = await self._process_youtube(url)
-            
-            if not content:
-                raise Exception(f"No content extracted from {platform} URL")
+                from article_processor import get_article_processor
+                _report(progress, 'crawling')
+                return await get_article_processor().process_url(url, bypass_cache=bypass_cache)
 
-            # Save transcript for social media content
-            if platform != 'article':
-                transcript_path = await self._save_transcript(content, url, platform)
+            # Reuse an earlier transcript of the same video when there is one
+            media_id = canonical_media_id(platform, url)
+            cached = None
+            if media_id and not bypass_cache:
+                cached = self.transcript_store.get(platform, media_id)
+                record_cache_lookup('transcript', cached is not None)
+            if cached:
+                logger.info(f"Reusing stored transcript for {platform} {media_id}")
+                _report(progress, 'cached_transcript')
+                content = cached['content']
+            else:
+                metadata = {}
+                _report(progress, 'downloading')
+                if platform == 'tiktok':
+                    content = await self._process_tiktok(url, progress=progress, metadata=metadata)
+                elif platform == 'instagram':
+                    content = await self._process_instagram(url, progress=progress, metadata=metadata)
+                elif platform == 'youtube':
+                    content = await self._process_youtube(url, progress=progress, metadata=metadata)
+                
+                if not content:
+                    raise Exception(f"No content extracted from {platform} URL")
+
+                # Save transcript for social media content
+                _report(progress, 'saving_transcript')
+                with span('save_transcript'):
+                    transcript_path = await self._save_transcript(content, url, platform)
+                    if media_id and TRANSCRIPTION_FAILED not in content:
+                        self.transcript_store.put(
+                            platform, media_id, content, url, duration=metadata.get('duration')
+                        )
                 if transcript_path:
                     logger.info(f"Transcript saved to: {transcript_path}")
 
-            return self._create_tweet(content, url, platform)
+            _report(progress, 'writing_tweet')
+            return await self._create_tweet(content, url, platform, bypass_cache=bypass_cache)
 
         except Exception as e:
             logger.error(f"Error processing {url}: {str(e)}")
@@ -82,108 +146,96 @@ class SocialMediaProcessor:
                 return 'article'
             raise ValueError("Unsupported platform")
 
-    async def _process_tiktok(self, url: str) -> Optional[str]:
+    async def _process_tiktok(
+        self,
+        url: str,
+        progress: Optional[Callable[[str], None]] = None,
+        metadata: Optional[dict] = None
+    ) -> Optional[str]:
         """Process TikTok video and extract content including audio transcription."""
         try:
-            # First, download the video with audio
-            ydl_opts = {
-                'format': 'best',  # Get best quality
-                'quiet': True,
-                'outtmpl': '%(title)s.%(ext)s',
-                'extract_audio': True,  # We need audio for transcription
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+            with tempfile.TemporaryDirectory() as workdir:
+                # Download only the audio stream
+                async with async_platform_limit('tiktok'):
+                    with span('download'):
+                        info, audio_path = await asyncio.to_thread(download_audio, url, Path(workdir))
+                if metadata is not None:
+                    metadata['duration'] = info.get('duration')
                 
                 # Get video information
                 title = info.get('title', '')
                 description = info.get('description', '')
                 uploader = info.get('uploader', '')
                 
-                # Get the downloaded file path
-                video_path = ydl.prepare_filename(info)
-                
-                # Convert video to audio and transcribe
-                transcript = await self._transcribe_video(video_path)
-                
-                # Combine all information
-                content = f"""
-                Title: {title}
-                Creator: {uploader}
-                Description: {description}
-                
-                Transcript:
-                {transcript}
-                """
-                
-                # Clean up downloaded file
-                try:
-                    os.remove(video_path)
-                except:
-                    pass
-                
-                return content.strip()
+                # Transcribe the audio
+                _report(progress, 'transcribing')
+                transcript = await self._transcribe_video(audio_path, Path(workdir))
+            
+            # Combine all information
+            content = f"""
+            Title: {title}
+            Creator: {uploader}
+            Description: {description}
+            
+            Transcript:
+            {transcript}
+            """
+            
+            return content.strip()
 
         except Exception as e:
             logger.error(f"TikTok processing error: {str(e)}")
             return None
 
-    async def _transcribe_video(self, video_path: str) -> str:
-        """Transcribe video audio using OpenAI's Whisper model."""
+    async def _transcribe_video(self, media_path: str, workdir: Path) -> str:
+        """Transcribe audio using OpenAI's Whisper model.
+
+        The media is transcoded to compact mono audio and long recordings are
+        split into overlapping segments that are transcribed concurrently.
+        """
         try:
-            with open(video_path, "rb") as audio_file:
-                transcript = self.client.audio.transcriptions.create(
-                    model="whisper-1",
-                    file=audio_file,
-                    response_format="text"
-                )
-            return transcript
+            return await transcribe_audio(self.client, media_path, workdir)
         except Exception as e:
             logger.error(f"Transcription error: {str(e)}")
-            return "Transcription failed"
+            return TRANSCRIPTION_FAILED
 
-    async def _process_instagram(self, url: str) -> Optional[str]:
+    async def _process_instagram(
+        self,
+        url: str,
+        progress: Optional[Callable[[str], None]] = None,
+        metadata: Optional[dict] = None
+    ) -> Optional[str]:
         """Process Instagram post and extract content including video transcription."""
         try:
             # Extract post ID from URL
             post_id = url.split('/')[-2]
-            post = Post.from_shortcode(self.insta.context, post_id)
-            
-            # Gather post information
-            caption = post.caption if post.caption else ''
-            location = f"📍 {post.location}" if post.location else ''
+            async with async_platform_limit('instagram'):
+                with span('download'):
+                    caption, location, is_video, video_url = await asyncio.to_thread(
+                        self._fetch_instagram_post, post_id
+                    )
             
             # Check if it's a video post
-            if post.is_video:
-                # Download video
-                ydl_opts = {
-                    'format': 'best',
-                    'quiet': True,
-                    'outtmpl': '%(title)s.%(ext)s',
-                    'extract_audio': True,
-                }
-                
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(post.video_url, download=True)
-                    video_path = ydl.prepare_filename(info)
-                    
-                    # Transcribe video
-                    transcript = await self._transcribe_video(video_path)
-                    
-                    # Clean up video file
-                    try:
-                        os.remove(video_path)
-                    except:
-                        pass
+            if is_video:
+                with tempfile.TemporaryDirectory() as workdir:
+                    # Download only the audio stream
+                    async with async_platform_limit('instagram'):
+                        with span('download'):
+                            info, audio_path = await asyncio.to_thread(download_audio, video_url, Path(workdir))
+                    if metadata is not None:
+                        metadata['duration'] = info.get('duration')
                     
-                    content = f"""
-                    Caption: {caption}
-                    Location: {location}
-                    
-                    Transcript:
-                    {transcript}
-                    """
+                    # Transcribe the audio
+                    _report(progress, 'transcribing')
+                    transcript = await self._transcribe_video(audio_path, Path(workdir))
+                
+                content = f"""
+                Caption: {caption}
+                Location: {location}
+                
+                Transcript:
+                {transcript}
+                """
             else:
                 content = f"""
                 Caption: {caption}
@@ -195,44 +247,56 @@ class SocialMediaProcessor:
             logger.error(f"Instagram processing error: {str(e)}")
             return None
 
-    async def _process_youtube(self, url: str) -> Optional[str]:
+    def _fetch_instagram_post(self, post_id: str):
+        """Looks up an Instagram post (blocking) and returns its caption, location and video URL.
+
+        The lookup runs on a pooled, reused Instagram session (see instagram_sessions).
+        """
+        def fetch(loader):
+            post = Post.from_shortcode(loader.context, post_id)
+
+            # Gather post information (properties may trigger lazy fetches)
+            caption = post.caption if post.caption else ''
+            location = f"📍 {post.location}" if post.location else ''
+            is_video = post.is_video
+            video_url = post.video_url if is_video else None
+            return caption, location, is_video, video_url
+
+        return get_instagram_pool().run(fetch)
+
+    async def _process_youtube(
+        self,
+        url: str,
+        progress: Optional[Callable[[str], None]] = None,
+        metadata: Optional[dict] = None
+    ) -> Optional[str]:
         """Process YouTube video and extract content with transcription."""
         try:
-            ydl_opts = {
-                'format': 'best',
-                'quiet': True,
-                'outtmpl': '%(title)s.%(ext)s',
-                'extract_audio': True,
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+            with tempfile.TemporaryDirectory() as workdir:
+                # Download only the audio stream
+                async with async_platform_limit('youtube'):
+                    with span('download'):
+                        info, audio_path = await asyncio.to_thread(download_audio, url, Path(workdir))
+                if metadata is not None:
+                    metadata['duration'] = info.get('duration')
                 title = info.get('title', '')
                 description = info.get('description', '')
                 uploader = info.get('uploader', '')
                 
-                # Get the downloaded file path
-                video_path = ydl.prepare_filename(info)
-                
-                # Transcribe video
-                transcript = await self._transcribe_video(video_path)
-                
-                # Clean up video file
-                try:
-                    os.remove(video_path)
-                except:
-                    pass
-                
-                content = f"""
-                Title: {title}
-                Creator: {uploader}
-                Description: {description}
-                
-                Transcript:
-                {transcript}
-                """
-                
-                return content.strip()
+                # Transcribe the audio
+                _report(progress, 'transcribing')
+                transcript = await self._transcribe_video(audio_path, Path(workdir))
+            
+            content = f"""
+            Title: {title}
+            Creator: {uploader}
+            Description: {description}
+            
+            Transcript:
+            {transcript}
+            """
+            
+            return content.strip()
         except Exception as e:
             logger.error(f"YouTube processing error: {str(e)}")
             return None
@@ -258,12 +322,13 @@ class SocialMediaProcessor:
             return None
 
    
-    def _create_tweet(self, content: str, url: str, platform: str) -> str:
+    async def _create_tweet(self, content: str, url: str, platform: str, bypass_cache: bool = False) -> str:
         """Create an engaging tweet from the social media content."""
         try:
             max_tweet_length = 280
 
-            response = self.client.chat.completions.create(
+            tweet = await acached_chat_completion(
+                self.client,
                 model="gpt-4",
                 messages=[
                     {
@@ -297,10 +362,11 @@ class SocialMediaProcessor:
                                             }
                 ],
                 max_tokens=100,
-                temperature=0.7
+                temperature=0.7,
+                bypass_cache=bypass_cache
             )
 
-            tweet = response.choices[0].message.content.strip()
+            tweet = tweet.strip()
             
             # Ensure tweet is within length limit without truncating mid-sentence
             if len(tweet) > max_tweet_length:
@@ -318,4 +384,15 @@ class SocialMediaProcessor:
 
         except Exception as e:
             logger.error(f"Error creating tweet: {str(e)}")
-            return None 
\ No newline at end of file
+            return None
+
+_processor = None
+_processor_lock = threading.Lock()
+
+def get_social_media_processor() -> SocialMediaProcessor:
+    """Returns the shared, long-lived SocialMediaProcessor."""
+    global _processor
+    with _processor_lock:
+        if _processor is None:
+            _processor = SocialMediaProcessor()
+        return _processor
@@ -0,0 +1,27 @@
+"""GPT-4 token counting shared by the article cleaner and the OpenAI rate limiter."""
+import threading
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+def _get_encoding():
+    """Loads the GPT-4 encoding on first use; tiktoken may download it on a cold cache."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.encoding_for_model("gpt-4")
+                except Exception:  # tiktoken missing or its encoding files unavailable
+                    _encoding = None
+                _encoding_loaded = True
+    return _encoding
+
+def count_tokens(text: str) -> int:
+    """Counts GPT-4 tokens with tiktoken, or estimates ~4 characters per token without it."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return max(1, len(text) // 4)
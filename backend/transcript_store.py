@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_MAX_AGE_SECONDS = int(os.getenv('TRANSCRIPT_MAX_AGE_SECONDS', str(30 * 24 * 3600)))
+TRANSCRIPT_MAX_ENTRIES = int(os.getenv('TRANSCRIPT_MAX_ENTRIES', '500'))
+
+YOUTUBE_ID = re.compile(r'^[\w-]{11}$')
+YOUTUBE_PATH_ID = re.compile(r'^/(?:shorts|embed|live|v)/([\w-]{11})')
+TIKTOK_PATH_ID = re.compile(r'/(?:video|photo)/(\d+)')
+INSTAGRAM_PATH_ID = re.compile(r'^/(?:[\w.]+/)?(?:p|reel|reels|tv)/([\w-]+)')
+
+def canonical_media_id(platform: str, url: str) -> Optional[str]:
+    """Returns the platform's own id for a media URL, or None if it cannot be derived.
+
+    YouTube video ids, TikTok numeric ids and Instagram shortcodes are used, so
+    different links to the same video map to the same transcript.
+    """
+    parsed = urlparse(url)
+    domain = parsed.netloc.lower()
+    path = parsed.path
+
+    if platform == 'youtube':
+        if 'youtu.be' in domain:
+            candidate = path.strip('/').split('/')[0]
+            return candidate if YOUTUBE_ID.match(candidate) else None
+        video_id = parse_qs(parsed.query).get('v', [None])[0]
+        if video_id and YOUTUBE_ID.match(video_id):
+            return video_id
+        match = YOUTUBE_PATH_ID.match(path)
+        return match.group(1) if match else None
+
+    if platform == 'tiktok':
+        # Short links (vm.tiktok.com/...) need a redirect to reveal the id
+        match = TIKTOK_PATH_ID.search(path)
+        return match.group(1) if match else None
+
+    if platform == 'instagram':
+        match = INSTAGRAM_PATH_ID.match(path)
+        return match.group(1) if match else None
+
+    return None
+
+class TranscriptStore:
+    """Transcripts on disk, keyed by platform and canonical media id.
+
+    Each entry is a JSON file with the extracted content and its metadata
+    (source URL, duration, fetch time). Entries expire after max_age_seconds,
+    and the least recently used ones are dropped beyond max_entries.
+    """
+
+    def __init__(
+        self,
+        store_dir: Path,
+        max_age_seconds: int = TRANSCRIPT_MAX_AGE_SECONDS,
+        max_entries: int = TRANSCRIPT_MAX_ENTRIES
+    ):
+        self.store_dir = Path(store_dir)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        self.max_age_seconds = max_age_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def get(self, platform: str, media_id: str) -> Optional[dict]:
+        """Returns the stored entry, or None when it is missing or expired."""
+        path = self._path(platform, media_id)
+        with self._lock:
+            try:
+                entry = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                return None
+
+            if time.time() - entry.get('fetched_at', 0) > self.max_age_seconds:
+                path.unlink(missing_ok=True)
+                return None
+
+            # Touch the file so eviction sees it as recently used
+            os.utime(path)
+            return entry
+
+    def put(self, platform: str, media_id: str, content: str, url: str,
+            duration: Optional[float] = None) -> dict:
+        """Stores a transcript and evicts old entries if needed."""
+        entry = {
+            'platform': platform,
+            'media_id': media_id,
+            'url': url,
+            'duration': duration,
+            'fetched_at': time.time(),
+            'content': content
+        }
+        path = self._path(platform, media_id)
+        with self._lock:
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps(entry, ensure_ascii=False), encoding='utf-8')
+            tmp_path.replace(path)
+            self._evict()
+        return entry
+
+    def _path(self, platform: str, media_id: str) -> Path:
+        safe_id = re.sub(r'[^\w\-]', '_', media_id)
+        return self.store_dir / f"{platform}_{safe_id}.json"
+
+    def _evict(self):
+        """Removes expired entries, then the least recently used over the limit."""
+        cutoff = time.time() - self.max_age_seconds
+        entries = []
+        for path in self.store_dir.glob('*.json'):
+            try:
+                mtime = path.stat().st_mtime
+            except OSError:
+                continue
+            if mtime < cutoff:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((mtime, path))
+
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+            path.unlink(missing_ok=True)
@@ -0,0 +1,122 @@
+"""Deterministic tweet formatting: the parts of the tweet prompt that need no LLM.
+
+format_locally() cleans and splits text itself and returns None when the
+input still needs a model to rewrite it.
+"""
+import re
+from typing import List, Optional
+
+MAX_TWEET_LENGTH = 280
+URL_LENGTH = 23  # t.co wraps every link to this length
+
+QUOTE_TRANSLATION = str.maketrans({
+    '\u201c': '"', '\u201d': '"', '\u201e': '"', '\u00ab': '"', '\u00bb': '"',
+    '\u2018': "'", '\u2019': "'", '\u201a': "'",
+    '\u2013': '-', '\u2014': '-', '\u2212': '-',
+    '\u2026': '...',
+    '\u00a0': ' ',
+})
+
+URL_PATTERN = re.compile(r'https?://\S+')
+# A hashtag starts a word (or follows a bracket), so example.com/#install is left alone
+HASHTAG_PATTERN = re.compile(r'(?<![^\s(])#(\w+)')
+TRAILING_HASHTAGS_PATTERN = re.compile(r'(?:\s*(?<![^\s(])#\w+)+\s*$')
+EMOJI_PATTERN = re.compile(
+    '['
+    '\U0001F000-\U0001FAFF'  # pictographs, emoticons, transport, symbols
+    '\u2600-\u27bf'          # misc symbols and dingbats
+    '\u2b00-\u2bff'          # arrows and stars
+    '\ufe0f\u200d'           # variation selector, zero-width joiner
+    '\U000E0020-\U000E007F'  # tag characters (flag sequences)
+    ']+'
+)
+# "Tweet 1:", "(1/5)" or "1/" at the start of a block; "1." is left alone, as it
+# usually starts a numbered list rather than labelling the tweet
+LABEL_PATTERN = re.compile(r'^\s*(?:tweet\s*\d+\s*[:.)\-]|\(\d+\s*/\s*\d+\)|\d+/(?=\s))\s*', re.IGNORECASE)
+SENTENCE_PATTERN = re.compile(r'(?<=[.!?])\s+(?=[\"\'(A-Z0-9])')
+# Signs of pasted author metadata or post chrome, which the prompt asks to drop.
+# A time only counts in the "5:30 PM · Jan 3, 2024" post timestamp form.
+AUTHOR_META_PATTERN = re.compile(
+    r'(^|\s)@\w+|replying to|\b\d+(?:[.,]\d+)?[km]?\s+(?:views|likes|reposts|retweets|replies)\b|\b\d{1,2}:\d{2}\s*(?:am|pm)\s*\u00b7|\b(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.? \d{1,2},? \d{4}\b',
+    re.IGNORECASE
+)
+
+def _char_weight(char: str) -> int:
+    """twitter-text weights: Latin, punctuation and common symbols count 1, the rest 2."""
+    code = ord(char)
+    if code <= 4351 or 8192 <= code <= 8205 or 8208 <= code <= 8223 or 8242 <= code <= 8247:
+        return 1
+    return 2
+
+def twitter_length(text: str) -> int:
+    """Measures text the way Twitter does: weighted characters, links as 23."""
+    length = 0
+    position = 0
+    for match in URL_PATTERN.finditer(text):
+        length += sum(_char_weight(char) for char in text[position:match.start()])
+        length += URL_LENGTH
+        position = match.end()
+    length += sum(_char_weight(char) for char in text[position:])
+    return length
+
+def normalize(text: str) -> str:
+    """Replaces typographic quotes, dashes and ellipses with plain ones."""
+    return text.translate(QUOTE_TRANSLATION)
+
+def clean_block(block: str) -> str:
+    """Strips the leading label, emojis and hashtags from one block of text."""
+    block = LABEL_PATTERN.sub('', block, count=1)
+    lines = []
+    for line in block.splitlines():
+        line = EMOJI_PATTERN.sub('', line)
+        line = TRAILING_HASHTAGS_PATTERN.sub('', line)
+        line = HASHTAG_PATTERN.sub(r'\1', line)  # Inline hashtags keep their word
+        line = re.sub(r'[ \t]{2,}', ' ', line).strip()
+        if line:
+            lines.append(line)
+    return '\n'.join(lines)
+
+def split_sentences(block: str) -> Optional[List[str]]:
+    """Packs sentences into tweets; None if a single sentence is too long on its own."""
+    tweets: List[str] = []
+    current = ''
+    for sentence in SENTENCE_PATTERN.split(block):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if twitter_length(sentence) > MAX_TWEET_LENGTH:
+            return None
+        candidate = f"{current} {sentence}" if current else sentence
+        if twitter_length(candidate) <= MAX_TWEET_LENGTH:
+            current = candidate
+        else:
+            tweets.append(current)
+            current = sentence
+    if current:
+        tweets.append(current)
+    return tweets
+
+def format_locally(text: str) -> Optional[List[str]]:
+    """Formats text into tweets without an LLM, or returns None if rewriting is needed.
+
+    Rewriting is needed when the text carries author handles, dates or post
+    statistics, or when a single sentence is longer than a tweet.
+    """
+    text = normalize(text)
+    if AUTHOR_META_PATTERN.search(text):
+        return None
+
+    tweets: List[str] = []
+    for block in re.split(r'\n\s*\n', text):
+        block = clean_block(block)
+        if not block:
+            continue
+        if twitter_length(block) <= MAX_TWEET_LENGTH:
+            tweets.append(block)
+            continue
+        parts = split_sentences(' '.join(block.splitlines()))
+        if parts is None:
+            return None
+        tweets.extend(parts)
+
+    return tweets or None
@@ -1,11 +1,19 @@
 import base64
 from typing import List
-from openai import OpenAI
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from image_preprocessor import PreparedImage, drop_duplicates, make_batches, prepare_image
+from openai_clients import get_openai_client
+from rate_limiter import call_openai, estimate_tokens
+
+VISION_MAX_CONCURRENT_BATCHES = int(os.getenv('VISION_MAX_CONCURRENT_BATCHES', '4'))
+VISION_OUTPUT_TOKENS_PER_IMAGE = int(os.getenv('VISION_OUTPUT_TOKENS_PER_IMAGE', '1000'))
+VISION_MAX_OUTPUT_TOKENS = 4096
 
 class VisionProcessor:
-    def __init__(self):
-        self.client = OpenAI()
+    def __init__(self, client=None):
+        self.client = client or get_openai_client()
 
     def encode_image(self, image_file) -> str:
         """Convert image file to base64 string."""
@@ -19,7 +27,12 @@ class VisionProcessor:
             return None
 
     def process_images(self, image_files: List, instructions: str = "") -> List[str]:
-        """Process multiple images using GPT-4 Vision API."""
+        """Process multiple images using GPT-4 Vision API.
+
+        Images are resized to what the model actually sees, exact duplicates are
+        dropped, and the rest are sent in concurrent batches. Text comes back in
+        upload order.
+        """
         try:
             # Default instruction if none provided
             if not instructions:
@@ -43,48 +56,77 @@ should be :
 "Scare a programmer with only one word. Go!"
                 """
 
-            # Prepare image content list
-            image_contents = []
-            for image_file in image_files:
-                base64_image = self.encode_image(image_file)
-                if base64_image:
-                    image_contents.append({
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:image/jpeg;base64,{base64_image}"
-                        }
-                    })
-
-            if not image_contents:
+            # Downsize, recompress and de-duplicate the uploads
+            prepared = [prepare_image(image_file, index) for index, image_file in enumerate(image_files)]
+            prepared = drop_duplicates([image for image in prepared if image])
+            if not prepared:
                 return []
 
+            # Send batches concurrently; map() keeps them in upload order
+            batches = make_batches(prepared)
+            with ThreadPoolExecutor(max_workers=min(len(batches), VISION_MAX_CONCURRENT_BATCHES)) as executor:
+                results = list(executor.map(lambda batch: self._process_batch(batch, instructions), batches))
+
+            return [block for blocks in results for block in blocks]
+
+        except Exception as e:
+            print(f"Error processing images: {str(e)}")
+            return []
+
+    def _process_batch(self, batch: List[PreparedImage], instructions: str) -> List[str]:
+        """Extracts text from one batch of prepared images."""
+        try:
             # Prepare the complete message content
             message_content = [{"type": "text", "text": instructions}]
-            message_content.extend(image_contents)
+            for image in batch:
+                base64_image = base64.b64encode(image.data).decode('utf-8')
+                message_content.append({
+                    "type": "image_url",
+                    "image_url": {
+                        "url": f"data:{image.mime_type};base64,{base64_image}",
+                        "detail": "high"
+                    }
+                })
+
+            messages = [{
+                "role": "user",
+                "content": message_content
+            }]
+            # Scale the output budget with the batch so long text is not cut off
+            max_tokens = min(VISION_MAX_OUTPUT_TOKENS, VISION_OUTPUT_TOKENS_PER_IMAGE * len(batch))
 
             # Make the API call
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",  # Correct model name
-                messages=[{
-                    "role": "user",
-                    "content": message_content
-                }],
-                max_tokens=1000,
+            response = call_openai(
+                "gpt-4o-mini",  # Correct model name
+                estimate_tokens(messages, max_tokens),
+                self.client.chat.completions.create,
+                messages=messages,
+                max_tokens=max_tokens,
                 temperature=0.1  # Lower temperature for more accurate extraction
             )
 
             # Extract the raw text content
-            content = response.choices[0].message.content
+            content = response.choices[0].message.content or ''
             
             # Basic cleaning while preserving structure
-            text_blocks = [block.strip() for block in content.split('\n\n') if block.strip()]
-            
-            return text_blocks
+            return [block.strip() for block in content.split('\n\n') if block.strip()]
 
         except Exception as e:
-            print(f"Error processing images: {str(e)}")
+            print(f"Error processing image batch: {str(e)}")
             return []
 
     def process_image(self, image_file, instructions: str = "") -> List[str]:
         """Process a single image (backward compatibility)."""
         return self.process_images([image_file], instructions)
+
+
+_processor = None
+_processor_lock = threading.Lock()
+
+def get_vision_processor() -> VisionProcessor:
+    """Returns the shared, long-lived VisionProcessor."""
+    global _processor
+    with _processor_lock:
+        if _processor is None:
+            _processor = VisionProcessor()
+        return _processor
@@ -0,0 +1,209 @@
+"""Local stand-ins for the services the backend talks to, with injectable latency.
+
+- FakeOpenAIServer: an HTTP server speaking the chat completions (plain and
+  streamed) and audio transcription endpoints, so the real OpenAI clients,
+  connection pools and rate limiter are exercised.
+- FakeSheetsManager: the GoogleSheetsManager surface the schedule mirror uses.
+- FakeCrawlerPool: CrawlerPool.crawl returning a canned article.
+- fake_download_audio / fake_split_audio: yt-dlp and ffmpeg replacements.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from types import SimpleNamespace
+
+ARTICLE_MARKDOWN = "\n\n".join([
+    "# Remote work is reshaping small city economies",
+    "A new survey of 4,000 workers found that 38% moved to a smaller city after their employer made remote work permanent.",
+    "Local governments report that the new residents spend more at independent shops, but housing prices rose by 12% in two years.",
+    "Economists say the trend is likely to continue as more companies cut office space and offer relocation stipends to staff.",
+    "Critics argue the shift widens the gap between workers who can work from anywhere and those who cannot leave their jobs.",
+])
+
+COMPLETION_TEXT = (
+    "Remote work moved 38% of surveyed workers to smaller cities.\n\n"
+    "Independent shops are winning, but housing prices rose 12% in two years."
+)
+TRANSCRIPT_TEXT = "Today I want to show you three simple habits that changed how I work from home."
+
+class Latency:
+    """Per-service delays in seconds, each with +/- jitter (a fraction of the delay)."""
+
+    def __init__(self, openai=0.5, sheets=0.3, crawl=1.0, download=1.5, jitter=0.2):
+        self.values = {'openai': openai, 'sheets': sheets, 'crawl': crawl, 'download': download}
+        self.jitter = jitter
+
+    def delay(self, service: str) -> float:
+        base = self.values[service]
+        return max(0.0, base * random.uniform(1 - self.jitter, 1 + self.jitter))
+
+    def to_dict(self) -> dict:
+        return dict(self.values, jitter=self.jitter)
+
+class FakeOpenAIServer:
+    """Serves /v1/chat/completions and /v1/audio/transcriptions on a local port."""
+
+    def __init__(self, latency: Latency):
+        latency_ref = latency
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                time.sleep(latency_ref.delay('openai'))
+                if self.path.endswith('/chat/completions'):
+                    request = json.loads(body or b'{}')
+                    if request.get('stream'):
+                        self._stream(request)
+                    else:
+                        self._completion(request)
+                elif self.path.endswith('/audio/transcriptions'):
+                    self._send(200, TRANSCRIPT_TEXT.encode('utf-8'), 'text/plain')
+                else:
+                    self._send(404, b'{"error": {"message": "not found"}}', 'application/json')
+
+            def _send(self, status, payload, content_type):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _completion(self, request):
+                prompt_tokens = len(json.dumps(request.get('messages', []))) // 4
+                completion_tokens = len(COMPLETION_TEXT) // 4
+                payload = {
+                    'id': f'chatcmpl-{uuid.uuid4().hex}',
+                    'object': 'chat.completion',
+                    'created': int(time.time()),
+                    'model': request.get('model', 'gpt-4'),
+                    'choices': [{
+                        'index': 0,
+                        'message': {'role': 'assistant', 'content': COMPLETION_TEXT},
+                        'finish_reason': 'stop'
+                    }],
+                    'usage': {
+                        'prompt_tokens': prompt_tokens,
+                        'completion_tokens': completion_tokens,
+                        'total_tokens': prompt_tokens + completion_tokens
+                    }
+                }
+                self._send(200, json.dumps(payload).encode('utf-8'), 'application/json')
+
+            def _stream(self, request):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/event-stream')
+                self.send_header('Connection', 'close')
+                self.end_headers()
+                completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+                for word in COMPLETION_TEXT.split(' '):
+                    chunk = {
+                        'id': completion_id,
+                        'object': 'chat.completion.chunk',
+                        'created': int(time.time()),
+                        'model': request.get('model', 'gpt-4'),
+                        'choices': [{'index': 0, 'delta': {'content': word + ' '}, 'finish_reason': None}]
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                if (request.get('stream_options') or {}).get('include_usage'):
+                    prompt_tokens = len(json.dumps(request.get('messages', []))) // 4
+                    completion_tokens = len(COMPLETION_TEXT) // 4
+                    chunk = {
+                        'id': completion_id,
+                        'object': 'chat.completion.chunk',
+                        'created': int(time.time()),
+                        'model': request.get('model', 'gpt-4'),
+                        'choices': [],
+                        'usage': {
+                            'prompt_tokens': prompt_tokens,
+                            'completion_tokens': completion_tokens,
+                            'total_tokens': prompt_tokens + completion_tokens
+                        }
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.close_connection = True
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_port}/v1"
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+
+class _FakeValues:
+    def __init__(self, manager):
+        self.manager = manager
+
+    def get(self, spreadsheetId, range):
+        return SimpleNamespace(execute=lambda: self.manager.read())
+
+class FakeSheetsManager:
+    """Keeps written rows in memory; every call pays the 'sheets' latency."""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+        self.spreadsheet_id = 'benchmark'
+        self.rows = {}
+        self.writes = 0
+        self.sheet = SimpleNamespace(values=lambda: _FakeValues(self))
+        self._lock = threading.Lock()
+
+    def read(self) -> dict:
+        time.sleep(self.latency.delay('sheets'))
+        with self._lock:
+            return {'values': [['Date', 'Day']] + [self.rows[row] for row in sorted(self.rows)]}
+
+    def create_header(self):
+        time.sleep(self.latency.delay('sheets'))
+
+    def batch_update_rows(self, rows, max_rows_per_request=500, max_payload_bytes=2_000_000):
+        time.sleep(self.latency.delay('sheets'))
+        with self._lock:
+            self.writes += 1
+            for row_number, values in rows:
+                self.rows[row_number] = values
+        return [{'row': row_number, 'updated': True, 'error': None} for row_number, _ in rows]
+
+class FakeCrawlerPool:
+    """CrawlerPool.crawl with a fixed article and the 'crawl' latency."""
+
+    def __init__(self, latency: Latency):
+        self.latency = latency
+
+    async def crawl(self, url: str, **kwargs):
+        await asyncio.sleep(self.latency.delay('crawl'))
+        return SimpleNamespace(markdown=ARTICLE_MARKDOWN, text=None)
+
+    def stats(self) -> dict:
+        return {'size': 0, 'idle': 0, 'waiting': 0}
+
+def make_fake_download_audio(latency: Latency):
+    """Returns a download_audio(url, workdir) replacement that writes a tiny audio file."""
+    def fake_download_audio(url: str, workdir: Path):
+        time.sleep(latency.delay('download'))
+        path = Path(workdir) / 'audio.mp3'
+        path.write_bytes(b'ID3' + b'\0' * 1024)
+        info = {'title': 'Benchmark video', 'description': 'Work from home habits', 'uploader': 'bench', 'duration': 60}
+        return info, str(path)
+    return fake_download_audio
+
+def fake_split_audio(source: str, workdir: Path):
+    """One segment, no ffmpeg."""
+    return [source]
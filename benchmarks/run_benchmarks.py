@@ -0,0 +1,334 @@
+"""End-to-end latency benchmarks for the API against local service fakes.
+
+Starts a fake OpenAI server and swaps Google Sheets, crawl4ai and yt-dlp for
+in-process fakes (see fakes.py), then serves the real Flask or ASGI app on a
+local port and loads each endpoint at several concurrency levels:
+
+    python benchmarks/run_benchmarks.py --app flask --concurrency 1,8,32
+    python benchmarks/run_benchmarks.py --app asgi --openai-latency 0.8 \
+        --compare benchmarks/results/flask-20250101-120000.json
+
+No config.json or credentials are needed: the runner writes throwaway ones to
+its temporary directory. Results (p50/p95/p99 latency, throughput, errors) are
+printed and written as JSON to benchmarks/results/ so runs can be compared.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+BACKEND = ROOT / 'backend'
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+ENDPOINTS = ['process-tweets', 'process-tweets-stream', 'process-article', 'process-social-media',
+             'process-batch', 'schedule', 'hooks']
+FINISHED = ('completed', 'failed', 'cancelled')
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fakes import (FakeCrawlerPool, FakeOpenAIServer, FakeSheetsManager, Latency,
+                   fake_split_audio, make_fake_download_audio)
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                              capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+def prepare_backend(latency: Latency, workdir: Path, real_limits: bool):
+    """Points the backend at the fakes; must run before the app module is imported."""
+    openai_server = FakeOpenAIServer(latency)
+    openai_server.start()
+
+    os.environ['OPENAI_BASE_URL'] = openai_server.base_url
+    os.environ['OPENAI_API_KEY'] = 'sk-benchmark'
+    os.environ['LLM_CACHE_PATH'] = str(workdir / 'llm_cache.sqlite3')
+    os.environ['SCHEDULE_JOURNAL_PATH'] = str(workdir / 'schedule_journal.sqlite3')
+    os.environ['SCHEDULE_STORE_PATH'] = str(workdir / 'schedule.sqlite3')
+    # settings.py needs a config.json; a fresh checkout has none, so use a throwaway one
+    credentials = workdir / 'credentials.json'
+    credentials.write_text('{}')
+    config = workdir / 'config.json'
+    config.write_text(json.dumps({
+        'openai_api_key': 'sk-benchmark',
+        'google_sheets_id': 'benchmark-sheet',
+        'google_sheets_credentials_file': str(credentials)
+    }))
+    os.environ['CONFIG_PATH'] = str(config)
+    if not real_limits:
+        # Measure the app, not the production rate limits
+        for model in ('GPT_4', 'GPT_4O_MINI', 'WHISPER_1'):
+            os.environ.setdefault(f'OPENAI_RPM_{model}', '100000')
+            os.environ.setdefault(f'OPENAI_TPM_{model}', '100000000')
+    sys.path.insert(0, str(BACKEND))
+
+    import GPT4_make_scheduler
+    import article_processor
+    import audio_pipeline
+    import social_media_processor
+    from transcript_store import TranscriptStore
+
+    sheets = FakeSheetsManager(latency)
+    GPT4_make_scheduler.get_sheets_manager = lambda *args, **kwargs: sheets
+    crawler_pool = FakeCrawlerPool(latency)
+    article_processor.get_crawler_pool = lambda: crawler_pool
+    social_media_processor.download_audio = make_fake_download_audio(latency)
+    audio_pipeline.split_audio = fake_split_audio
+
+    # Keep transcripts out of the repository
+    processor = social_media_processor.get_social_media_processor()
+    processor.transcripts_dir = workdir / 'transcripts'
+    processor.transcripts_dir.mkdir(exist_ok=True)
+    processor.transcript_store = TranscriptStore(processor.transcripts_dir / 'store')
+
+    return openai_server, sheets, credentials
+
+def start_app(kind: str, credentials: Path) -> str:
+    """Serves app.py (Flask) or asgi_app.py (ASGI) in a background thread; returns its base URL."""
+    port = _free_port()
+    if kind == 'flask':
+        import app as app_module
+        from werkzeug.serving import make_server
+        app_module.credentials_path = credentials
+        server = make_server('127.0.0.1', port, app_module.app, threaded=True)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+    else:
+        import asgi_app as app_module
+        import uvicorn
+        app_module.credentials_path = credentials
+        server = uvicorn.Server(uvicorn.Config(app_module.app, host='127.0.0.1', port=port, log_level='warning'))
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+
+    # The apps configure verbose logging on import; keep the benchmark output readable
+    logging.getLogger().setLevel(logging.WARNING)
+    return f"http://127.0.0.1:{port}"
+
+def make_request(endpoint: str, counter):
+    """Returns an async callable sending one request to endpoint; inputs are unique to avoid caches."""
+    async def process_tweets(client):
+        n = next(counter)
+        return await client.post('/api/process-tweets', data={
+            'tweets': f"Benchmark thread {n}: remote work moved people to smaller cities and prices rose.",
+            'forceRewrite': 'true'
+        })
+
+    async def process_tweets_stream(client):
+        n = next(counter)
+        # Read to the end: the latency that matters is the whole stream
+        return await client.post('/api/process-tweets/stream', data={
+            'tweets': f"Benchmark stream {n}: remote work moved people to smaller cities and prices rose.",
+            'forceRewrite': 'true'
+        })
+
+    async def process_article(client):
+        n = next(counter)
+        return await client.post('/api/process-article', json={
+            'url': f"https://example.com/news/story-{n}.html", 'bypassCache': True
+        })
+
+    async def process_social_media(client):
+        n = next(counter)
+        response = await client.post('/api/process-social-media', json={
+            'url': f"https://www.youtube.com/watch?v=bench{n:06d}", 'bypassCache': True
+        })
+        if response.status_code != 202:
+            return response
+        # The endpoint queues a job; the latency that matters is until it finishes
+        status_url = response.json()['statusUrl']
+        while True:
+            await asyncio.sleep(0.02)
+            response = await client.get(status_url)
+            if response.status_code != 200 or response.json()['status'] in FINISHED:
+                return response
+
+    async def process_batch(client):
+        n = next(counter)
+        return await client.post('/api/process-batch', json={
+            'urls': [f"https://www.youtube.com/watch?v=batch{n:06d}",
+                     f"https://example.com/news/batch-{n}.html"],
+            'bypassCache': True
+        })
+
+    async def schedule(client):
+        n = next(counter)
+        return await client.post('/api/schedule', json={
+            'tweets': "\n\n".join(f"Scheduled benchmark tweet {n}-{i}" for i in range(5))
+        })
+
+    async def hooks(client):
+        return await client.get('/api/hooks', headers={'Accept-Encoding': 'gzip'})
+
+    return {
+        'process-tweets': process_tweets,
+        'process-tweets-stream': process_tweets_stream,
+        'process-article': process_article,
+        'process-social-media': process_social_media,
+        'process-batch': process_batch,
+        'schedule': schedule,
+        'hooks': hooks,
+    }[endpoint]
+
+def _events(body: str):
+    """(event, data) pairs of a server-sent event stream."""
+    for message in body.split('\n\n'):
+        fields = dict(line.split(': ', 1) for line in message.splitlines() if ': ' in line)
+        if 'event' in fields:
+            yield fields['event'], json.loads(fields.get('data', 'null'))
+
+def _failed(response) -> bool:
+    """HTTP errors, background jobs that finished as failed, and streams that reported errors."""
+    if response.status_code >= 400:
+        return True
+    if response.headers.get('content-type', '').startswith('text/event-stream'):
+        events = list(_events(response.text))
+        if not events or events[-1][0] != 'done':
+            return True
+        # /api/process-batch reports failed URLs in its closing summary
+        return bool(events[-1][1].get('failed'))
+    if response.headers.get('content-type', '').startswith('application/json'):
+        body = response.json()
+        return isinstance(body, dict) and body.get('status') == 'failed'
+    return False
+
+async def run_load(base_url, send, total, concurrency, timeout):
+    """Sends `total` requests with at most `concurrency` in flight; returns a summary dict."""
+    import httpx
+
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    if _failed(await send(client)):
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'requests': total,
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+    }
+
+def print_table(results, baseline=None):
+    columns = ['requests', 'errors', 'throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms']
+    previous = {(row['endpoint'], row['concurrency']): row for row in (baseline or [])}
+    print(f"{'endpoint':<22}{'conc':>6}" + ''.join(f"{column:>16}" for column in columns))
+    for row in results:
+        line = f"{row['endpoint']:<22}{row['concurrency']:>6}" + ''.join(f"{row[column]:>16}" for column in columns)
+        before = previous.get((row['endpoint'], row['concurrency']))
+        if before and before['p95_ms']:
+            line += f"   p95 {100 * (row['p95_ms'] - before['p95_ms']) / before['p95_ms']:+.1f}% vs baseline"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--app', choices=['flask', 'asgi'], default='flask')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help=f"Comma-separated subset of {ENDPOINTS}")
+    parser.add_argument('--concurrency', default='1,8,32', help='Comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=50, help='Requests per endpoint and concurrency level')
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--openai-latency', type=float, default=0.5)
+    parser.add_argument('--sheets-latency', type=float, default=0.3)
+    parser.add_argument('--crawl-latency', type=float, default=1.0)
+    parser.add_argument('--download-latency', type=float, default=1.5)
+    parser.add_argument('--jitter', type=float, default=0.2, help='Latency jitter as a fraction of each delay')
+    parser.add_argument('--real-limits', action='store_true', help='Keep the production OpenAI RPM/TPM limits')
+    parser.add_argument('--output', default=None, help='Results file (default: benchmarks/results/<app>-<time>.json)')
+    parser.add_argument('--compare', default=None, help='Earlier results file to compare p95 against')
+    args = parser.parse_args()
+
+    endpoints = [endpoint.strip() for endpoint in args.endpoints.split(',') if endpoint.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(',')]
+
+    latency = Latency(args.openai_latency, args.sheets_latency, args.crawl_latency, args.download_latency, args.jitter)
+    workdir = Path(tempfile.mkdtemp(prefix='tweet-scheduler-bench-'))
+    openai_server, sheets, credentials = prepare_backend(latency, workdir, args.real_limits)
+    base_url = start_app(args.app, credentials)
+
+    counter = itertools.count()
+    results = []
+    for endpoint in endpoints:
+        for concurrency in levels:
+            summary = asyncio.run(run_load(
+                base_url, make_request(endpoint, counter), args.requests, concurrency, args.timeout
+            ))
+            results.append(dict(endpoint=endpoint, concurrency=concurrency, **summary))
+            print(f"{endpoint} @ {concurrency}: p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, "
+                  f"{summary['throughput_rps']} req/s, {summary['errors']} errors")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+    print()
+    print_table(results, baseline)
+
+    report = {
+        'meta': {
+            'app': args.app,
+            'commit': _git_commit(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'requests_per_level': args.requests,
+            'latency': latency.to_dict(),
+            'real_limits': args.real_limits,
+            'sheets_writes': sheets.writes,
+        },
+        'results': results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"{args.app}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"\nResults written to {output}")
+
+    openai_server.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Fire the same load at the Flask and ASGI servers and compare latency.
+
+Start both servers first, for example:
+
+    cd backend && python app.py                              # Flask on :3000
+    cd backend && uvicorn asgi_app:app --port 3001           # ASGI on :3001
+
+then run:
+
+    python scripts/load_compare.py --endpoint /api/process-article \
+        --json '{"url": "https://example.com/news/story.html"}' --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+async def run_load(base_url, method, endpoint, payload, total, concurrency, timeout):
+    """Sends `total` requests with at most `concurrency` in flight; returns a summary dict."""
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def one():
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, endpoint, json=payload)
+                    if response.status_code >= 500:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(total)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        'requests': total,
+        'errors': errors,
+        'seconds': elapsed,
+        'throughput_rps': total / elapsed if elapsed else 0.0,
+        'mean_ms': statistics.mean(latencies) * 1000 if latencies else 0.0,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--flask-url', default='http://localhost:3000')
+    parser.add_argument('--asgi-url', default='http://localhost:3001')
+    parser.add_argument('--endpoint', default='/api/hooks')
+    parser.add_argument('--method', default=None, help='Defaults to POST when --json is given, else GET')
+    parser.add_argument('--json', default=None, help='JSON request body')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    payload = json.loads(args.json) if args.json else None
+    method = args.method or ('POST' if payload is not None else 'GET')
+
+    results = {}
+    for name, base_url in (('flask', args.flask_url), ('asgi', args.asgi_url)):
+        results[name] = asyncio.run(run_load(
+            base_url, method, args.endpoint, payload, args.requests, args.concurrency, args.timeout
+        ))
+
+    columns = ['requests', 'errors', 'throughput_rps', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms']
+    print(f"{method} {args.endpoint}  concurrency={args.concurrency}")
+    print(f"{'server':<8}" + ''.join(f"{column:>16}" for column in columns))
+    for name, summary in results.items():
+        print(f"{name:<8}" + ''.join(f"{summary[column]:>16.1f}" for column in columns))
+
+if __name__ == '__main__':
+    main()
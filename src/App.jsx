@@ -185,7 +185,7 @@ function App() {
         throw new Error(result.error || 'Failed to schedule tweets')
       }
 
-      alert('Tweets scheduled successfully!')
+      alert(result.message || 'Tweets scheduled successfully!')
     } catch (error) {
       console.error('Error:', error)
       alert('Error scheduling tweets')
@@ -209,10 +209,27 @@ function App() {
         }),
       });
 
-      const result = await response.json();
+      const queued = await response.json();
       if (!response.ok) {
-        throw new Error(result.error || 'Failed to process social media content');
+        throw new Error(queued.error || 'Failed to process social media content');
+      }
+
+      // Poll the background job until it finishes
+      let job = queued;
+      while (!['completed', 'failed', 'cancelled'].includes(job.status)) {
+        await new Promise(resolve => setTimeout(resolve, 1000));
+        const jobResponse = await fetch(`http://localhost:3000/api/jobs/${queued.jobId}`);
+        job = await jobResponse.json();
+        if (!jobResponse.ok) {
+          throw new Error(job.error || 'Failed to read job status');
+        }
+        setProcessingStep(`Processing social media content (${job.stage})...`);
+      }
+
+      if (job.status !== 'completed') {
+        throw new Error(job.error || 'Failed to process social media content');
       }
+      const result = job.result;
 
       // Update both the content and tweets textarea
       setFormData(prev => ({
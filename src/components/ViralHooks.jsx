@@ -1,62 +1,92 @@
 import { useState, useEffect } from 'react'
 import './ViralHooks.css'
-import { fetchHooks } from '../config/hooks'
+import { HOOK_CATEGORIES } from '../config/hooks'
+
+const PAGE_SIZE = 20
+
+// Local filtering over the bundled hooks, used when the search API is unreachable
+function searchLocally(query, category, page) {
+  let hooks = []
+  Object.entries(HOOK_CATEGORIES).forEach(([key, data]) => {
+    if (!category || category === key) {
+      hooks = hooks.concat(data.examples.map(template => ({ category: key, template })))
+    }
+  })
+  const matches = hooks.filter(hook => hook.template.toLowerCase().includes(query.toLowerCase()))
+  const categories = Object.fromEntries(
+    Object.entries(HOOK_CATEGORIES).map(([key, data]) => [key, data.title])
+  )
+  return {
+    total: matches.length,
+    categories,
+    results: matches.slice((page - 1) * PAGE_SIZE, page * PAGE_SIZE)
+  }
+}
 
 function ViralHooks() {
   const [selectedCategory, setSelectedCategory] = useState('all')
   const [searchTerm, setSearchTerm] = useState('')
-  const [hookCategories, setHookCategories] = useState(null)
+  const [page, setPage] = useState(1)
+  const [categories, setCategories] = useState(null)
+  const [results, setResults] = useState([])
+  const [total, setTotal] = useState(0)
   const [loading, setLoading] = useState(true)
-  const [error, setError] = useState(null)
 
   useEffect(() => {
+    const controller = new AbortController()
+    const category = selectedCategory === 'all' ? '' : selectedCategory
+
     async function loadHooks() {
+      let data
       try {
-        const data = await fetchHooks()
-        setHookCategories(data)
-        setLoading(false)
+        const params = new URLSearchParams({ q: searchTerm, category, page, pageSize: PAGE_SIZE })
+        const response = await fetch(`http://localhost:3000/api/hooks/search?${params}`, { signal: controller.signal })
+        if (!response.ok) throw new Error(`Search failed: ${response.status}`)
+        data = await response.json()
       } catch (err) {
-        setError('Failed to load hooks')
-        setLoading(false)
+        if (err.name === 'AbortError') return
+        console.error('Error searching hooks:', err)
+        data = searchLocally(searchTerm, category, page)
       }
+      setCategories(data.categories)
+      setResults(data.results)
+      setTotal(data.total)
+      setLoading(false)
     }
-    loadHooks()
-  }, [])
 
-  const filteredHooks = () => {
-    if (!hookCategories) return []
-    let hooks = []
-
-    if (selectedCategory === 'all') {
-      Object.values(hookCategories).forEach(category => {
-        hooks = hooks.concat(category.examples)
-      })
-    } else {
-      hooks = hookCategories[selectedCategory]?.examples || []
+    // Debounce typing so each keystroke doesn't send a request
+    const timer = setTimeout(loadHooks, 150)
+    return () => {
+      clearTimeout(timer)
+      controller.abort()
     }
+  }, [selectedCategory, searchTerm, page])
 
-    return hooks.filter(hook => hook.toLowerCase().includes(searchTerm.toLowerCase()))
+  const selectCategory = (category) => {
+    setSelectedCategory(category)
+    setPage(1)
   }
 
+  const pageCount = Math.max(1, Math.ceil(total / PAGE_SIZE))
+
   if (loading) return <div>Loading...</div>
-  if (error) return <div>{error}</div>
 
   return (
     <div className="hooks-container">
       <div className="hooks-nav">
         <button
           className={`hook-nav-btn ${selectedCategory === 'all' ? 'active' : ''}`}
-          onClick={() => setSelectedCategory('all')}
+          onClick={() => selectCategory('all')}
         >
           All
         </button>
-        {Object.keys(hookCategories).map(category => (
+        {Object.keys(categories).map(category => (
           <button
             key={category}
             className={`hook-nav-btn ${selectedCategory === category ? 'active' : ''}`}
-            onClick={() => setSelectedCategory(category)}
+            onClick={() => selectCategory(category)}
           >
-            {hookCategories[category].title}
+            {categories[category]}
           </button>
         ))}
       </div>
@@ -64,21 +94,24 @@ function ViralHooks() {
       <div className="hooks-search">
         <input
           type="text"
-          placeholder="Search hooks..."
+          placeholder="Search hooks or {placeholders}..."
           value={searchTerm}
-          onChange={(e) => setSearchTerm(e.target.value)}
+          onChange={(e) => {
+            setSearchTerm(e.target.value)
+            setPage(1)
+          }}
         />
       </div>
 
       <div className="hooks-content">
         <div className="hooks-examples">
-          {filteredHooks().map((hook, index) => (
-            <div key={index} className="hook-example">
-              <p>{hook}</p>
-              <button 
+          {results.map(hook => (
+            <div key={`${hook.category}-${hook.template}`} className="hook-example">
+              <p>{hook.template}</p>
+              <button
                 className="copy-btn"
                 onClick={() => {
-                  navigator.clipboard.writeText(hook);
+                  navigator.clipboard.writeText(hook.template);
                   // Optional: Show a copied notification
                 }}
               >
@@ -87,9 +120,20 @@ function ViralHooks() {
             </div>
           ))}
         </div>
+        {pageCount > 1 && (
+          <div className="hooks-pagination">
+            <button className="hook-nav-btn" disabled={page <= 1} onClick={() => setPage(page - 1)}>
+              Previous
+            </button>
+            <span>Page {page} of {pageCount}</span>
+            <button className="hook-nav-btn" disabled={page >= pageCount} onClick={() => setPage(page + 1)}>
+              Next
+            </button>
+          </div>
+        )}
       </div>
     </div>
   )
 }
 
-export default ViralHooks 
\ No newline at end of file
+export default ViralHooks
@@ -59,16 +59,3 @@ export const HOOK_CATEGORIES = {
         ]
     }
 }
-
-// Update the fetchHooks function to use HOOK_CATEGORIES as fallback
-export async function fetchHooks() {
-    try {
-        const response = await fetch('/api/hooks');
-        const data = await response.json();
-        return data;
-    } catch (error) {
-        console.error('Error fetching hooks:', error);
-        // Fallback to local constant if API fails
-        return HOOK_CATEGORIES;
-    }
-} 
\ No newline at end of file